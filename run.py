@@ -4,6 +4,7 @@ Startup script for Resume Tailor API
 """
 import uvicorn
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -24,11 +25,18 @@ if __name__ == "__main__":
     print("💚 Health Check: http://localhost:8000/health")
     print()
     
+    # Auto-reload is for development only; it is incompatible with multiple workers
+    reload = os.getenv("RELOAD", "false").lower() in ("1", "true", "yes")
+    workers = None if reload else int(os.getenv("WORKERS", 2 * (os.cpu_count() or 1)))
+    
     uvicorn.run(
         "src.app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=reload,
+        workers=workers,
+        loop="uvloop" if sys.platform != "win32" else "asyncio",  # uvloop is not available on Windows
+        http="httptools",
         log_level="info"
     )
 
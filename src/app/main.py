@@ -1,11 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
+from dotenv import load_dotenv
 import os
 
 # Import routers
 from .routers.resume_router import router as resume_router
+from .services import AIService, FileService
+
+# Load environment variables before any service reads them
+load_dotenv()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the services once at startup so all requests share the connection pool and caches
+    app.state.ai_service = AIService()
+    await app.state.ai_service.load_tokenizer()
+    app.state.file_service = FileService()
+    yield
+    await app.state.ai_service.aclose()
+    app.state.file_service.close()
 
 # create the Fast API app instance with simple metadata
 app = FastAPI(
@@ -13,7 +30,9 @@ app = FastAPI(
     version="0.0.1",
     description="AI-powered resume tailoring service that optimizes resumes for specific job descriptions",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -47,8 +66,10 @@ def root():
         "endpoints": {
             "health": "/health",
             "resume_analysis": "/resume/analyze",
+            "streaming_analysis": "/resume/analyze-stream",
             "file_analysis": "/resume/analyze-file",
             "detailed_analysis": "/resume/detailed-analysis",
-            "keywords": "/resume/keywords"
+            "keywords": "/resume/keywords",
+            "cache_stats": "/resume/cache-stats"
         }
     }
\ No newline at end of file
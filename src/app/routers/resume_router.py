@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, Depends
+from fastapi.responses import StreamingResponse
 from typing import Optional
-import tempfile
-import os
+import asyncio
+import hashlib
+import orjson
 from loguru import logger
 
 from ..models import (
@@ -14,54 +16,50 @@ from ..services import AIService, FileService
 
 router = APIRouter(prefix="/resume", tags=["resume"])
 
-# Initialize services
-ai_service = AIService()
-file_service = FileService()
+# Uploads are read in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def get_ai_service(request: Request) -> AIService:
+    """Return the AIService created at application startup"""
+    return request.app.state.ai_service
+
+def get_file_service(request: Request) -> FileService:
+    """Return the FileService created at application startup"""
+    return request.app.state.file_service
 
 @router.post("/analyze", response_model=ResumeAnalysisResponse)
-async def analyze_resume(request: ResumeAnalysisRequest):
+async def analyze_resume(request: ResumeAnalysisRequest, ai_service: AIService = Depends(get_ai_service)):
     """
     Analyze and tailor a resume based on a job description
     """
     try:
         logger.info("Starting resume analysis")
         
-        # Extract keywords from job description
-        keywords_data = ai_service.extract_keywords_from_job_description(request.job_description)
-        keywords = [kw['keyword'] for kw in keywords_data]
-        
-        # Analyze keyword matches in resume
-        keyword_analysis = ai_service.analyze_resume_keywords(request.resume_text, keywords)
-        
-        # Tailor the resume
-        tailored_resume = ai_service.tailor_resume(
+        # Extract keywords, tailor the resume and generate suggestions in one LLM call
+        analysis = await ai_service.analyze_all(
             request.resume_text, 
             request.job_description, 
             request.target_role
         )
+        keywords_data = analysis['keywords']
+        keywords = [kw['keyword'] for kw in keywords_data]
+        tailored_resume = analysis['tailored_resume']
+        suggestions = analysis['suggestions']
         
-        # Generate improvement suggestions
-        suggestions = ai_service.generate_improvement_suggestions(
-            request.resume_text, 
-            request.job_description, 
-            keyword_analysis
-        )
+        # Analyze keyword matches in resume
+        keyword_analysis = ai_service.analyze_resume_keywords(request.resume_text, keywords)
         
         # Calculate confidence score
         confidence_score = ai_service.calculate_confidence_score(keyword_analysis, keywords_data)
         
-        # Prepare keyword matches for response
-        keyword_matches = {
-            kw: data['frequency'] 
-            for kw, data in keyword_analysis.items() 
-            if data['found']
-        }
-        
-        # Get missing keywords
-        missing_keywords = [
-            kw for kw, data in keyword_analysis.items() 
-            if not data['found']
-        ]
+        # Split keywords into matches (with frequency) and missing in one pass
+        keyword_matches = {}
+        missing_keywords = []
+        for kw, data in keyword_analysis.items():
+            if data['found']:
+                keyword_matches[kw] = data['frequency']
+            else:
+                missing_keywords.append(kw)
         
         # Generate analysis summary
         analysis_summary = f"""
@@ -89,13 +87,75 @@ async def analyze_resume(request: ResumeAnalysisRequest):
         logger.error(f"Error in resume analysis: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+def _sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+@router.post("/analyze-stream")
+async def analyze_resume_stream(request: ResumeAnalysisRequest, ai_service: AIService = Depends(get_ai_service)):
+    """
+    Analyze and tailor a resume, streaming results as Server-Sent Events.
+    
+    Events: "tailored_resume" and "suggestions" carry text deltas in "delta",
+    "keywords" carries the keyword analysis, and "done" ends the stream.
+    """
+    async def event_stream():
+        # Keyword extraction runs while the tailored resume streams
+        keywords_task = asyncio.create_task(
+            ai_service.extract_keywords_from_job_description(request.job_description)
+        )
+        try:
+            async for delta in ai_service.tailor_resume_stream(
+                request.resume_text,
+                request.job_description,
+                request.target_role
+            ):
+                yield _sse_event("tailored_resume", {"delta": delta})
+            
+            keywords_data = await keywords_task
+            keywords = [kw['keyword'] for kw in keywords_data]
+            keyword_analysis = ai_service.analyze_resume_keywords(request.resume_text, keywords)
+            
+            keyword_matches = {}
+            missing_keywords = []
+            for kw, data in keyword_analysis.items():
+                if data['found']:
+                    keyword_matches[kw] = data['frequency']
+                else:
+                    missing_keywords.append(kw)
+            
+            yield _sse_event("keywords", {
+                "keyword_matches": keyword_matches,
+                "missing_keywords": missing_keywords,
+                "confidence_score": ai_service.calculate_confidence_score(keyword_analysis, keywords_data)
+            })
+            
+            async for delta in ai_service.generate_improvement_suggestions_stream(
+                request.resume_text,
+                request.job_description,
+                keyword_analysis
+            ):
+                yield _sse_event("suggestions", {"delta": delta})
+            
+            yield _sse_event("done", {})
+            
+        except Exception as e:
+            logger.error(f"Error in streaming resume analysis: {e}")
+            yield _sse_event("error", {"detail": f"Analysis failed: {str(e)}"})
+        finally:
+            keywords_task.cancel()
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.post("/analyze-file")
 async def analyze_resume_file(
     resume_file: UploadFile = File(...),
     job_description: str = Form(...),
     target_role: Optional[str] = Form(None),
     industry: Optional[str] = Form(None),
-    experience_level: Optional[str] = Form(None)
+    experience_level: Optional[str] = Form(None),
+    ai_service: AIService = Depends(get_ai_service),
+    file_service: FileService = Depends(get_file_service)
 ):
     """
     Analyze resume from uploaded file
@@ -110,42 +170,39 @@ async def analyze_resume_file(
         if not file_format:
             raise HTTPException(status_code=400, detail="Unsupported file format")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(resume_file.filename)[1]) as temp_file:
-            content = await resume_file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        try:
-            # Validate file size
-            if not file_service.validate_file_size(temp_file_path):
+        # Read the upload in chunks, rejecting oversized files early and hashing
+        # on the way so repeated uploads can skip extraction
+        content = bytearray()
+        digest = hashlib.blake2b()
+        while chunk := await resume_file.read(UPLOAD_CHUNK_SIZE):
+            content.extend(chunk)
+            if not file_service.validate_content_size(len(content)):
                 raise HTTPException(status_code=400, detail="File too large (max 10MB)")
-            
-            # Extract text from file
-            resume_text = file_service.extract_text_from_file(temp_file_path, file_format)
+            digest.update(chunk)
+        
+        resume_text = file_service.get_cached_text(digest.hexdigest(), file_format)
+        if resume_text is None:
+            # Extract text straight from memory in a worker thread; PDF/DOCX parsing is CPU-bound
+            resume_text = await asyncio.to_thread(file_service.extract_text_from_bytes, bytes(content), file_format)
             if not resume_text:
                 raise HTTPException(status_code=400, detail="Could not extract text from file")
             
             # Clean the text
-            resume_text = file_service.clean_text(resume_text)
-            
-            # Create analysis request
-            request = ResumeAnalysisRequest(
-                resume_text=resume_text,
-                job_description=job_description,
-                target_role=target_role,
-                industry=industry,
-                experience_level=experience_level
-            )
-            
-            # Perform analysis
-            return await analyze_resume(request)
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                
+            resume_text = await asyncio.to_thread(file_service.clean_text, resume_text)
+            file_service.cache_text(digest.hexdigest(), file_format, resume_text)
+        
+        # Create analysis request
+        request = ResumeAnalysisRequest(
+            resume_text=resume_text,
+            job_description=job_description,
+            target_role=target_role,
+            industry=industry,
+            experience_level=experience_level
+        )
+        
+        # Perform analysis
+        return await analyze_resume(request, ai_service)
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -153,60 +210,55 @@ async def analyze_resume_file(
         raise HTTPException(status_code=500, detail=f"File processing failed: {str(e)}")
 
 @router.post("/detailed-analysis", response_model=DetailedAnalysisResponse)
-async def detailed_resume_analysis(request: ResumeAnalysisRequest):
+async def detailed_resume_analysis(request: ResumeAnalysisRequest, ai_service: AIService = Depends(get_ai_service)):
     """
     Perform detailed analysis with section-by-section breakdown
     """
     try:
         logger.info("Starting detailed resume analysis")
         
-        # Extract keywords
-        keywords_data = ai_service.extract_keywords_from_job_description(request.job_description)
+        # Extract keywords, split sections and generate recommendations in one LLM call
+        analysis = await ai_service.analyze_all(
+            request.resume_text,
+            request.job_description,
+            request.target_role,
+            include_tailored=False
+        )
+        keywords_data = analysis['keywords']
+        sections_data = analysis['sections']
+        recommendations = analysis['suggestions']
         keywords = [kw['keyword'] for kw in keywords_data]
         
-        # Analyze resume sections
-        sections_data = ai_service.analyze_resume_sections(request.resume_text)
-        
         # Analyze keywords
         keyword_analysis = ai_service.analyze_resume_keywords(request.resume_text, keywords)
         
-        # Create detailed keyword analysis
+        # Create detailed keyword analysis; every keyword has an entry in keyword_analysis
         detailed_keywords = []
         for kw_data in keywords_data:
             keyword = kw_data['keyword']
-            analysis = keyword_analysis.get(keyword, {})
-            
+            ka = keyword_analysis[keyword]
             detailed_keywords.append({
                 "keyword": keyword,
                 "importance": kw_data.get('importance', 0),
-                "found_in_resume": analysis.get('found', False),
-                "frequency": analysis.get('frequency', 0),
-                "context": analysis.get('context', [])
+                "found_in_resume": ka['found'],
+                "frequency": ka['frequency'],
+                "context": ka['context']
             })
         
+        # Tailor every section and generate section-specific improvements
+        tailored_contents, section_improvements = await ai_service.tailor_sections(
+            sections_data,
+            request.job_description,
+            request.target_role,
+            keyword_analysis
+        )
+        
         # Create section analysis
         sections = []
-        for section_data in sections_data:
-            section_name = section_data.get('section_name', 'Unknown')
-            original_content = section_data.get('content', '')
-            
-            # Tailor this section
-            tailored_content = ai_service.tailor_resume(
-                original_content,
-                request.job_description,
-                request.target_role
-            )
-            
-            # Generate section-specific improvements
-            improvements = ai_service.generate_improvement_suggestions(
-                original_content,
-                request.job_description,
-                {kw: keyword_analysis.get(kw, {}) for kw in keywords}
-            )
-            
+        for section_data, tailored_content, improvements in zip(sections_data, tailored_contents, section_improvements):
             sections.append({
-                "section_name": section_name,
-                "original_content": original_content,
+                "section_name": section_data.get('section_name', 'Unknown'),
+                "original_content": section_data.get('content', ''),
                 "tailored_content": tailored_content,
                 "improvements": improvements[:3]  # Limit to 3 suggestions per section
             })
@@ -214,13 +266,6 @@ async def detailed_resume_analysis(request: ResumeAnalysisRequest):
         # Calculate overall score
         overall_score = ai_service.calculate_confidence_score(keyword_analysis, keywords_data)
         
-        # Generate recommendations
-        recommendations = ai_service.generate_improvement_suggestions(
-            request.resume_text,
-            request.job_description,
-            keyword_analysis
-        )
-        
         # Industry insights (placeholder for future enhancement)
         industry_insights = {
             "trending_skills": [kw['keyword'] for kw in keywords_data[:5]],
@@ -241,14 +286,21 @@ async def detailed_resume_analysis(request: ResumeAnalysisRequest):
         raise HTTPException(status_code=500, detail=f"Detailed analysis failed: {str(e)}")
 
 @router.get("/keywords")
-async def extract_keywords(job_description: str):
+async def extract_keywords(job_description: str, ai_service: AIService = Depends(get_ai_service)):
     """
     Extract keywords from a job description
     """
     try:
-        keywords = ai_service.extract_keywords_from_job_description(job_description)
+        keywords = await ai_service.extract_keywords_from_job_description(job_description)
         return {"keywords": keywords}
     except Exception as e:
         logger.error(f"Error extracting keywords: {e}")
         raise HTTPException(status_code=500, detail=f"Keyword extraction failed: {str(e)}")
 
+
+@router.get("/cache-stats")
+async def cache_stats(ai_service: AIService = Depends(get_ai_service)):
+    """
+    Report hit/miss statistics for the LLM response cache
+    """
+    return ai_service.cache_stats()
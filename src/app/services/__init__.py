@@ -1,5 +1,5 @@
 from .ai_service import AIService
 from .file_service import FileService
+from .cache_service import ResponseCache
 
-__all__ = ['AIService', 'FileService']
-
+__all__ = ['AIService', 'FileService', 'ResponseCache']
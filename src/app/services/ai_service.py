@@ -1,51 +1,627 @@
 import os
 import re
-import json
-import requests
-from typing import List, Dict, Tuple, Any
+import time
+import bisect
+import itertools
+import asyncio
+import hashlib
+import functools
+import httpx
+import ahocorasick
+import openai
+import orjson
+from typing import List, Dict, Tuple, Any, Optional, AsyncIterator
+import tiktoken
 from loguru import logger
-from dotenv import load_dotenv
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
+from .cache_service import ResponseCache
+from .ollama_common import KeywordMatcher, OllamaEmbeddings
 
-load_dotenv()
+# Keywords recognized by the fallback extractor, with importance and category
+_FALLBACK_KEYWORDS = [
+    # Common technical skills
+    *((keyword, 0.8, 'technical') for keyword in [
+        'python', 'java', 'javascript', 'react', 'node.js', 'sql', 'aws', 'docker',
+        'kubernetes', 'machine learning', 'ai', 'data science', 'git', 'agile',
+        'scrum', 'api', 'rest', 'graphql', 'html', 'css', 'typescript', 'angular',
+        'vue.js', 'mongodb', 'postgresql', 'mysql', 'redis', 'elasticsearch',
+        'kafka', 'spark', 'hadoop', 'tensorflow', 'pytorch', 'scikit-learn'
+    ]),
+    # Common soft skills
+    *((keyword, 0.6, 'soft_skill') for keyword in [
+        'leadership', 'communication', 'teamwork', 'problem solving', 'analytical',
+        'creative', 'organized', 'detail-oriented', 'time management', 'collaboration',
+        'mentoring', 'project management', 'customer service', 'sales', 'marketing'
+    ]),
+    # Common tools
+    *((keyword, 0.7, 'tool') for keyword in [
+        'jira', 'confluence', 'slack', 'teams', 'zoom', 'figma', 'sketch',
+        'photoshop', 'illustrator', 'excel', 'powerpoint', 'word', 'outlook'
+    ]),
+]
+
+_FALLBACK_MATCHER = KeywordMatcher(keyword for keyword, _, _ in _FALLBACK_KEYWORDS)
+
+# Substrings marking a line as a section header in the fallback section analysis
+_SECTION_KEYWORDS = {
+    'experience': ['experience', 'work history', 'employment', 'career'],
+    'education': ['education', 'academic', 'degree', 'university', 'college'],
+    'skills': ['skills', 'technical skills', 'competencies', 'expertise'],
+    'summary': ['summary', 'objective', 'profile', 'about'],
+    'projects': ['projects', 'portfolio', 'achievements'],
+    'certifications': ['certifications', 'certificates', 'licenses']
+}
+
+def _build_section_automaton() -> ahocorasick.Automaton:
+    """Build an automaton over every section keyword, to find candidate header lines"""
+    automaton = ahocorasick.Automaton()
+    for keywords in _SECTION_KEYWORDS.values():
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+_SECTION_AUTOMATON = _build_section_automaton()
+
+# Word-like tokens used to match single-word keywords ("python", "node.js", "c++", "c#")
+_TOKEN_RE = re.compile(r"[a-z0-9.+#]+")
+
+@functools.lru_cache(maxsize=4096)
+def _keyword_pattern(keyword: str) -> re.Pattern:
+    """Compiled case-insensitive pattern for a keyword, reused across requests"""
+    return re.compile(re.escape(keyword), re.IGNORECASE)
+
+# Bump when prompts change so persisted responses for the old prompts are not reused
+PROMPT_VERSION = "1"
+
+# Seconds before the Ollama availability probe is repeated, normally and when no backend was found
+OLLAMA_PROBE_TTL = 60.0
+NO_BACKEND_PROBE_TTL = 30.0
+
+# Input longer than this many tokens is truncated before being put in a prompt
+MAX_INPUT_TOKENS = 6000
+
+# Completion token budgets for prose, keyword JSON and the combined analysis JSON
+MAX_OUTPUT_TOKENS = 2048
+MAX_KEYWORD_OUTPUT_TOKENS = 512
+MAX_COMBINED_OUTPUT_TOKENS = 4096
+
+# Seconds to wait for the tokenizer at startup; a slower download finishes in the background
+TOKENIZER_LOAD_TIMEOUT = 10.0
+
+# Set by load_encoding(); requests never load it themselves because the first load may download it
+_ENCODING: Optional[tiktoken.Encoding] = None
+
+def load_encoding() -> Optional[tiktoken.Encoding]:
+    """
+    Load the tokenizer, downloading it on first use.
+    
+    Blocking, so call it off the event loop. Failures are not remembered, so a
+    later call tries again.
+    """
+    global _ENCODING
+    if _ENCODING is None:
+        try:
+            _ENCODING = tiktoken.encoding_for_model("gpt-4o")
+        except Exception as e:
+            logger.warning(f"Tokenizer unavailable, truncating prompts by characters: {e}")
+    return _ENCODING
+
+def _truncate_tokens(text: str, max_tokens: int = MAX_INPUT_TOKENS) -> str:
+    """Truncate text to at most max_tokens tokens"""
+    # Every token spans at least one UTF-8 byte, so short text cannot exceed the budget
+    if len(text) <= max_tokens and (text.isascii() or len(text.encode("utf-8")) <= max_tokens):
+        return text
+    
+    encoding = _ENCODING
+    if encoding is None:
+        # Roughly 4 characters per token for English text
+        return text[:max_tokens * 4]
+    
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def _log_retry(retry_state) -> None:
+    """Log an OpenAI call that is about to be retried"""
+    logger.warning(
+        f"OpenAI call failed ({retry_state.outcome.exception()}), "
+        f"retrying in {retry_state.next_action.sleep:.1f}s (attempt {retry_state.attempt_number})"
+    )
 
 class AIService:
     def __init__(self):
-        # Try Ollama first (free, local AI)
-        self.ollama_available = self._check_ollama_connection()
+        self._http = None
         
-        if self.ollama_available:
-            logger.info("Ollama client initialized successfully")
-            self.client = "ollama"
-        else:
-            # Fallback to OpenAI if available
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key or api_key == "your_openai_api_key_here":
-                self.client = None
-                logger.warning("Neither Ollama nor OpenAI available. AI features will be disabled.")
-            else:
-                try:
-                    from openai import OpenAI
-                    self.client = OpenAI(api_key=api_key)
-                    logger.info("OpenAI client initialized successfully")
-                except Exception as e:
-                    logger.error(f"Failed to initialize OpenAI client: {e}")
-                    self.client = None
+        # Async keep-alive pool shared by every Ollama call; local generation can take minutes
+        self._ollama_http = httpx.AsyncClient(
+            base_url="http://localhost:11434",
+            timeout=httpx.Timeout(300.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0)
+        )
+        
+        # The backend is chosen on first use and re-checked once the probe result is stale
+        self.client = None
+        self.ollama_available = False
+        self._openai_client = None
+        self._openai_initialized = False
+        self._probed_at: Optional[float] = None
+        self._probe_lock = asyncio.Lock()
+        self._tokenizer_task: Optional[asyncio.Task] = None
         
         self.model = "llama2"  # Default to Ollama model
+        # Keep the Ollama model loaded between calls instead of letting it unload after 5 minutes
+        self.ollama_keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self._embeddings = OllamaEmbeddings()
+        # OpenAI models: the heavy tier writes prose, the light tier handles structured extraction
+        self.model_heavy = "gpt-4o"
+        self.model_light = "gpt-4o-mini"
+        
+        # Bound concurrent OpenAI requests to stay within the account's rate limits
+        self._semaphore = asyncio.Semaphore(int(os.getenv("OPENAI_MAX_CONCURRENCY", "10")))
+        # Ollama batches up to OLLAMA_NUM_PARALLEL requests per model and queues the rest,
+        # so send no more than that at once to keep queued requests off the read timeout
+        self._ollama_semaphore = asyncio.Semaphore(int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+        
+        # Content-addressed cache of LLM responses, persisted across restarts
+        self._cache = ResponseCache()
+        self._hits = 0
+        self._misses = 0
+        
+        # Opt-in OpenAI Batch API for detailed analysis (half price, minutes of latency)
+        self.use_batch = os.getenv("OPENAI_USE_BATCH", "false").lower() in ("1", "true", "yes")
+        self.batch_timeout = float(os.getenv("OPENAI_BATCH_TIMEOUT", "900"))
+        self.batch_poll_interval = 5.0
+    
+    async def load_tokenizer(self) -> None:
+        """Load the tokenizer off the event loop; called from the app lifespan"""
+        try:
+            await asyncio.wait_for(asyncio.shield(self._start_tokenizer_load()), TOKENIZER_LOAD_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tokenizer not loaded after {TOKENIZER_LOAD_TIMEOUT:.0f}s, continuing to load in the background")
+    
+    def _start_tokenizer_load(self) -> asyncio.Task:
+        """Start loading the tokenizer in a worker thread unless a load is already running"""
+        if self._tokenizer_task is None or self._tokenizer_task.done():
+            self._tokenizer_task = asyncio.create_task(asyncio.to_thread(load_encoding))
+        return self._tokenizer_task
+    
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections held by the service"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        await self._ollama_http.aclose()
+        self._cache.close()
+    
+    async def _cached_chat(
+        self,
+        prompt: str,
+        temperature: float,
+        json_mode: bool = False,
+        model: str = None,
+        max_tokens: int = MAX_OUTPUT_TOKENS
+    ) -> str:
+        """Call the OpenAI chat API, serving repeated prompts from the cache"""
+        model = model or self.model_heavy
+        key = self._cache_key(prompt, temperature, json_mode, model, max_tokens)
+        
+        cached = await self._cache.aget(key)
+        if cached is not None:
+            self._hits += 1
+            return cached
+        
+        self._misses += 1
+        async with self._semaphore:
+            response = await self._create_completion(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **({"response_format": {"type": "json_object"}} if json_mode else {})
+            )
+        
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            # Cut off at max_tokens: not a usable answer, and caching it would replay the failure
+            raise RuntimeError(f"{model} response truncated at {max_tokens} tokens")
+        content = choice.message.content
+        await self._cache.aset(key, content)
+        return content
+    
+    async def _stream_chat(self, prompt: str, temperature: float) -> AsyncIterator[str]:
+        """Stream an OpenAI chat completion, caching the full text once complete"""
+        key = self._cache_key(prompt, temperature)
+        
+        cached = await self._cache.aget(key)
+        if cached is not None:
+            self._hits += 1
+            yield cached
+            return
+        
+        self._misses += 1
+        parts = []
+        finish_reason = None
+        async with self._semaphore:
+            response = await self._create_completion(
+                model=self.model_heavy,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=MAX_OUTPUT_TOKENS,
+                stream=True
+            )
+            async for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+        
+        if finish_reason == "length":
+            raise RuntimeError(f"{self.model_heavy} response truncated at {MAX_OUTPUT_TOKENS} tokens")
+        await self._cache.aset(key, "".join(parts))
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_random_exponential(min=1, max=30),
+        retry=retry_if_exception_type((
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError
+        )),
+        before_sleep=_log_retry,
+        reraise=True
+    )
+    async def _create_completion(self, **kwargs):
+        """Create an OpenAI chat completion, retrying transient failures with backoff"""
+        return await self.client.chat.completions.create(**kwargs)
+    
+    def _cache_key(
+        self,
+        prompt: str,
+        temperature: float,
+        json_mode: bool = False,
+        model: str = None,
+        max_tokens: int = MAX_OUTPUT_TOKENS
+    ) -> str:
+        """Content-addressed cache key for an OpenAI chat request"""
+        model = model or self.model_heavy
+        return hashlib.blake2b(f"{PROMPT_VERSION}\x00{model}\x00{prompt}\x00{temperature}\x00{json_mode}\x00{max_tokens}".encode()).hexdigest()
+    
+    async def submit_batch(self, batch_requests: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Run chat prompts through the OpenAI Batch API.
+        
+        Each request is a dict with "prompt" and "temperature". Returns the
+        response content for each request in order, or None where that
+        request failed. Cached prompts are answered without being submitted.
+        """
+        results: List[Optional[str]] = [None] * len(batch_requests)
+        pending = {}
+        for i, req in enumerate(batch_requests):
+            key = self._cache_key(req["prompt"], req["temperature"])
+            cached = await self._cache.aget(key)
+            if cached is not None:
+                self._hits += 1
+                results[i] = cached
+            else:
+                pending[f"req-{i}"] = (i, key)
+        
+        if not pending:
+            return results
+        
+        lines = []
+        for custom_id, (i, _) in pending.items():
+            lines.append(orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model_heavy,
+                    "messages": [{"role": "user", "content": batch_requests[i]["prompt"]}],
+                    "temperature": batch_requests[i]["temperature"],
+                    "max_tokens": MAX_OUTPUT_TOKENS
+                }
+            }))
+        
+        self._misses += len(pending)
+        batch_input = await self.client.files.create(
+            file=("batch.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted OpenAI batch {batch.id} with {len(pending)} requests")
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_timeout
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if loop.time() > deadline:
+                await self.client.batches.cancel(batch.id)
+                raise TimeoutError(f"OpenAI batch {batch.id} did not complete within {self.batch_timeout}s")
+            await asyncio.sleep(self.batch_poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"OpenAI batch {batch.id} ended with status {batch.status}")
+        
+        output = await self.client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            item = orjson.loads(line)
+            if item.get("custom_id") not in pending:
+                continue
+            i, key = pending[item["custom_id"]]
+            response = item.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.error(f"Batch request {item['custom_id']} failed: {item.get('error')}")
+                continue
+            choice = response["body"]["choices"][0]
+            if choice.get("finish_reason") == "length":
+                logger.error(f"Batch request {item['custom_id']} was truncated at {MAX_OUTPUT_TOKENS} tokens")
+                continue
+            content = choice["message"]["content"]
+            await self._cache.aset(key, content)
+            results[i] = content
+        
+        return results
+    
+    async def tailor_sections(
+        self,
+        sections: List[Dict[str, str]],
+        job_description: str,
+        target_role: str = None,
+        keyword_analysis: Dict[str, Any] = None
+    ) -> Tuple[List[str], List[List[str]]]:
+        """
+        Tailor each resume section and generate section-specific improvements.
+        
+        Returns (tailored_contents, improvements) aligned with sections. When
+        batch mode is enabled for OpenAI, every prompt goes out in one batch;
+        otherwise the calls are made concurrently.
+        """
+        await self._ensure_client()
+        keyword_analysis = keyword_analysis or {}
+        contents = [section.get('content', '') for section in sections]
+        
+        if self.client and self.client != "ollama" and self.use_batch and contents:
+            try:
+                batch_requests = [
+                    {"prompt": self._tailor_prompt(content, job_description, target_role), "temperature": 0.3}
+                    for content in contents
+                ] + [
+                    {"prompt": self._suggestions_prompt(content, job_description, keyword_analysis), "temperature": 0.4}
+                    for content in contents
+                ]
+                results = await self.submit_batch(batch_requests)
+                
+                tailored = [
+                    result.strip() if result else content
+                    for content, result in zip(contents, results[:len(contents)])
+                ]
+                improvements = [
+                    self._parse_suggestions(result) if result
+                    else self._fallback_suggestions(content, job_description, keyword_analysis)
+                    for content, result in zip(contents, results[len(contents):])
+                ]
+                return tailored, improvements
+                
+            except Exception as e:
+                logger.error(f"Error running section batch, falling back to concurrent calls: {e}")
+        
+        tailored, improvements = await asyncio.gather(
+            asyncio.gather(*[
+                self.tailor_resume(content, job_description, target_role)
+                for content in contents
+            ]),
+            asyncio.gather(*[
+                self.generate_improvement_suggestions(content, job_description, keyword_analysis)
+                for content in contents
+            ])
+        )
+        return list(tailored), list(improvements)
     
-    def _check_ollama_connection(self) -> bool:
+    async def analyze_all(
+        self,
+        resume_text: str,
+        job_description: str,
+        target_role: str = None,
+        include_tailored: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Extract keywords, split sections, tailor the resume and generate
+        suggestions with a single LLM call.
+        
+        Returns a dict with "keywords", "sections", "tailored_resume" and
+        "suggestions". If the combined response cannot be used, the individual
+        methods are run concurrently instead.
+        """
+        await self._ensure_client()
+        if not self.client:
+            logger.warning("No AI client available. Using fallback analysis.")
+            return await self._analyze_separately(resume_text, job_description, target_role, include_tailored)
+        
+        prompt = self._analyze_all_prompt(resume_text, job_description, target_role, include_tailored)
+        
+        try:
+            if self.client == "ollama":
+                system_prompt = """You are an expert resume writer and career coach. Only return valid JSON, no other text."""
+                response = await self._call_ollama(prompt, system_prompt, json_mode=True)
+                json_match = re.search(r'\{.*\}', response, re.DOTALL)
+                result = orjson.loads(json_match.group()) if json_match else None
+            else:
+                content = await self._cached_chat(prompt, temperature=0.2, json_mode=True, max_tokens=MAX_COMBINED_OUTPUT_TOKENS)
+                result = orjson.loads(content)
+            
+            if self._is_valid_combined_result(result, include_tailored):
+                return {
+                    "keywords": result["keywords"],
+                    "sections": result["sections"],
+                    "tailored_resume": (result.get("tailored_resume") or "").strip() or resume_text,
+                    "suggestions": [s.strip() for s in result["suggestions"] if s.strip()]
+                }
+            
+            logger.warning("Combined analysis response was incomplete. Running individual analyses.")
+            
+        except Exception as e:
+            logger.error(f"Error in combined analysis: {e}")
+        
+        return await self._analyze_separately(resume_text, job_description, target_role, include_tailored)
+    
+    def _analyze_all_prompt(self, resume_text: str, job_description: str, target_role: str = None, include_tailored: bool = True) -> str:
+        """Build the single multi-task prompt used by analyze_all"""
+        tailored_field = """
+        - "tailored_resume": the full resume rewritten to better match the job description. Incorporate relevant keywords naturally, highlight relevant experience, use action verbs and quantifiable achievements, keep it ATS-friendly and truthful, and keep the same general structure"
+        """ if include_tailored else ""
+        
+        return f"""
+        Analyze the resume against the job description and return a single JSON object with these fields:
+        - "keywords": array of the most important keywords, skills, and requirements from the job description, each an object with "keyword", "importance" (0-1), and "category" ("technical", "soft_skill", "tool", "qualification", or "experience")
+        - "sections": array of the main resume sections, each an object with "section_name" (e.g., "Experience", "Education", "Skills", "Summary") and "content" (the original text of that section){tailored_field}
+        - "suggestions": array of 5-7 specific, actionable suggestions (strings) that would help this resume better match the job requirements
+        
+        Job Description:
+        {_truncate_tokens(job_description)}
+        
+        Target Role: {target_role or "Not specified"}
+        
+        Resume:
+        {_truncate_tokens(resume_text)}
+        
+        Return only the JSON object.
+        """
+    
+    def _is_valid_combined_result(self, result: Any, include_tailored: bool) -> bool:
+        """Check that a combined analysis response has every expected field"""
+        if not isinstance(result, dict):
+            return False
+        if not isinstance(result.get("keywords"), list) or not all(isinstance(kw, dict) and "keyword" in kw for kw in result["keywords"]):
+            return False
+        if not isinstance(result.get("sections"), list) or not all(isinstance(sec, dict) for sec in result["sections"]):
+            return False
+        if not isinstance(result.get("suggestions"), list) or not all(isinstance(s, str) for s in result["suggestions"]):
+            return False
+        if include_tailored and not isinstance(result.get("tailored_resume"), str):
+            return False
+        return True
+    
+    async def _analyze_separately(
+        self,
+        resume_text: str,
+        job_description: str,
+        target_role: str = None,
+        include_tailored: bool = True
+    ) -> Dict[str, Any]:
+        """Run the individual analysis methods concurrently"""
+        tailored_task = None
+        if include_tailored:
+            tailored_task = asyncio.create_task(self.tailor_resume(resume_text, job_description, target_role))
+        
+        keywords_data, sections_data = await asyncio.gather(
+            self.extract_keywords_from_job_description(job_description),
+            self.analyze_resume_sections(resume_text)
+        )
+        
+        keyword_analysis = self.analyze_resume_keywords(resume_text, [kw['keyword'] for kw in keywords_data])
+        suggestions = await self.generate_improvement_suggestions(resume_text, job_description, keyword_analysis)
+        
+        return {
+            "keywords": keywords_data,
+            "sections": sections_data,
+            "tailored_resume": await tailored_task if tailored_task else resume_text,
+            "suggestions": suggestions
+        }
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return LLM response cache statistics"""
+        total = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / total if total else 0.0,
+            **self._cache.stats()
+        }
+    
+    def _probe_is_fresh(self) -> bool:
+        """Whether the last backend probe can still be trusted"""
+        if self._probed_at is None:
+            return False
+        # Without any backend, look for one again sooner so requests leave the fallbacks quickly
+        ttl = OLLAMA_PROBE_TTL if self.client else NO_BACKEND_PROBE_TTL
+        return time.monotonic() - self._probed_at < ttl
+    
+    async def _ensure_client(self) -> None:
+        """Pick the AI backend, re-probing Ollama only once the last probe is stale"""
+        if self._probe_is_fresh():
+            return
+        
+        async with self._probe_lock:
+            # Another request may have probed while this one waited
+            if self._probe_is_fresh():
+                return
+            
+            # Retry a tokenizer load that failed, on the probe's schedule and without waiting for it
+            if _ENCODING is None:
+                self._start_tokenizer_load()
+            
+            # Try Ollama first (free, local AI)
+            self.ollama_available = await self._check_ollama_connection()
+            self._probed_at = time.monotonic()
+            
+            if self.ollama_available:
+                if self.client != "ollama":
+                    logger.info("Ollama client initialized successfully")
+                self.client = "ollama"
+            else:
+                # Fallback to OpenAI if available
+                self.client = self._get_openai_client()
+    
+    def _get_openai_client(self) -> Optional[openai.AsyncOpenAI]:
+        """Create the OpenAI client on first use; None if no API key is configured"""
+        if self._openai_initialized:
+            return self._openai_client
+        self._openai_initialized = True
+        
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key or api_key == "your_openai_api_key_here":
+            logger.warning("Neither Ollama nor OpenAI available. AI features will be disabled.")
+            return None
+        
+        try:
+            # HTTP/2 keep-alive pool shared by every concurrent OpenAI call
+            self._http = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=60.0),
+                timeout=httpx.Timeout(connect=5.0, read=120.0, write=30.0, pool=5.0)
+            )
+            # Retries are handled by _create_completion, not the client
+            self._openai_client = openai.AsyncOpenAI(api_key=api_key, http_client=self._http, max_retries=0)
+            logger.info("OpenAI client initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize OpenAI client: {e}")
+        return self._openai_client
+    
+    async def _check_ollama_connection(self) -> bool:
         """Check if Ollama is running and accessible"""
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
+            response = await self._ollama_http.get("/api/tags", timeout=5)
             return response.status_code == 200
         except Exception as e:
-            logger.error(f"Ollama connection failed: {e}")
+            logger.debug(f"Ollama connection failed: {e}")
             return False
     
-    def extract_keywords_from_job_description(self, job_description: str) -> List[Dict[str, Any]]:
+    async def extract_keywords_from_job_description(self, job_description: str) -> List[Dict[str, Any]]:
         """Extract important keywords and skills from job description"""
+        await self._ensure_client()
         if self.client == "ollama":
-            return self._extract_keywords_with_ollama(job_description)
+            return await self._extract_keywords_with_ollama(job_description)
         elif not self.client:
             logger.warning("No AI client available. Using fallback keyword extraction.")
             return self._fallback_keyword_extraction(job_description)
@@ -56,31 +632,27 @@ class AIService:
             Focus on technical skills, soft skills, tools, technologies, and qualifications.
             
             Job Description:
-            {job_description}
+            {_truncate_tokens(job_description)}
             
-            Return a JSON array with objects containing:
+            Return a JSON object with a "keywords" array of objects containing:
             - keyword: the keyword/skill
             - importance: importance score (0-1)
             - category: "technical", "soft_skill", "tool", "qualification", or "experience"
             
-            Format as JSON array only.
+            Format as JSON only.
             """
             
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.1
-                )
+                content = await self._cached_chat(prompt, temperature=0.1, json_mode=True, model=self.model_light, max_tokens=MAX_KEYWORD_OUTPUT_TOKENS)
                 
-                keywords_data = json.loads(response.choices[0].message.content)
+                keywords_data = orjson.loads(content)["keywords"]
                 return keywords_data
                 
             except Exception as e:
                 logger.error(f"Error extracting keywords: {e}")
                 return self._fallback_keyword_extraction(job_description)
     
-    def _extract_keywords_with_ollama(self, job_description: str) -> List[Dict[str, Any]]:
+    async def _extract_keywords_with_ollama(self, job_description: str) -> List[Dict[str, Any]]:
         """Extract keywords using Ollama"""
         system_prompt = """You are an expert at analyzing job descriptions and extracting key skills and requirements. 
         Return your response as a JSON array with objects containing: keyword, importance (0-1), and category (technical, soft_skill, tool, qualification, or experience).
@@ -89,18 +661,32 @@ class AIService:
         prompt = f"""
         Analyze this job description and extract the most important keywords, skills, and requirements:
         
-        {job_description}
+        {_truncate_tokens(job_description)}
         
         Return as JSON array with objects: [{{"keyword": "skill", "importance": 0.8, "category": "technical"}}]
         """
         
+        # An exact repeat is answered by _call_ollama's cache, so skip the embedding round trip;
+        # otherwise near-duplicate job descriptions reuse an earlier extraction
+        embedding = None
+        namespace = f"keywords\x00{self._embeddings.model}"
+        if await self._cache.aget(self._ollama_cache_key(prompt, system_prompt)) is None:
+            embedding = await self._embed_with_ollama(_truncate_tokens(job_description))
+            if embedding:
+                cached = await self._cache.aget_similar(namespace, embedding)
+                if cached is not None:
+                    self._hits += 1
+                    return orjson.loads(cached)
+        
         try:
-            response = self._call_ollama(prompt, system_prompt)
+            response = await self._call_ollama(prompt, system_prompt)
             
             # Try to extract JSON from response
             json_match = re.search(r'\[.*\]', response, re.DOTALL)
             if json_match:
-                keywords_data = json.loads(json_match.group())
+                keywords_data = orjson.loads(json_match.group())
+                if embedding:
+                    await self._cache.aset_similar(namespace, embedding, orjson.dumps(keywords_data).decode())
                 return keywords_data
             else:
                 return self._fallback_keyword_extraction(job_description)
@@ -109,114 +695,288 @@ class AIService:
             logger.error(f"Error extracting keywords with Ollama: {e}")
             return self._fallback_keyword_extraction(job_description)
     
-    def _call_ollama(self, prompt: str, system_prompt: str = None) -> str:
-        """Make a call to Ollama API"""
+    async def _embed_with_ollama(self, text: str) -> Optional[List[float]]:
+        """Embed text with the Ollama embedding model; None if embeddings are unavailable"""
+        if self._embeddings.missing:
+            return None
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False
-            }
-            
-            if system_prompt:
-                payload["system"] = system_prompt
-            
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()["response"]
-            else:
-                logger.error(f"Ollama API error: {response.status_code}")
-                return ""
-                
+            async with self._ollama_semaphore:
+                response = await self._ollama_http.post(
+                    "/api/embeddings", content=self._embeddings.payload(text), headers={"Content-Type": "application/json"}
+                )
+            return self._embeddings.parse(response)
+        except Exception as e:
+            if isinstance(e, httpx.ConnectError):
+                self._probed_at = None
+            logger.warning(f"Error embedding text with Ollama: {e}")
+        return None
+    
+    async def _call_ollama(self, prompt: str, system_prompt: str = None, json_mode: bool = False) -> str:
+        """Make a call to Ollama API, returning the full response text"""
+        try:
+            return "".join([delta async for delta in self._stream_ollama(prompt, system_prompt, json_mode)])
         except Exception as e:
             logger.error(f"Error calling Ollama: {e}")
             return ""
     
+    def _ollama_cache_key(self, prompt: str, system_prompt: str = None, json_mode: bool = False) -> str:
+        """Response cache key for an Ollama generation"""
+        return hashlib.blake2b(
+            f"{PROMPT_VERSION}\x00ollama\x00{self.model}\x00{system_prompt}\x00{prompt}\x00{json_mode}".encode()
+        ).hexdigest()
+    
+    async def _stream_ollama(self, prompt: str, system_prompt: str = None, json_mode: bool = False) -> AsyncIterator[str]:
+        """Stream an Ollama generation, caching the full text once complete"""
+        key = self._ollama_cache_key(prompt, system_prompt, json_mode)
+        cached = await self._cache.aget(key)
+        if cached is not None:
+            self._hits += 1
+            yield cached
+            return
+        
+        self._misses += 1
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.ollama_keep_alive
+        }
+        
+        if system_prompt:
+            payload["system"] = system_prompt
+        
+        if json_mode:
+            payload["format"] = "json"
+        
+        parts = []
+        done = False
+        try:
+            async with self._ollama_semaphore:
+                async with self._ollama_http.stream("POST", "/api/generate", json=payload) as response:
+                    if response.status_code != 200:
+                        logger.error(f"Ollama API error: {response.status_code}")
+                        return
+                    
+                    # Ollama streams one JSON object per line
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = orjson.loads(line)
+                        if "error" in chunk:
+                            # Failures after generation starts arrive as an error line inside the 200 response
+                            raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+                        delta = chunk.get("response")
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+                        if chunk.get("done"):
+                            if chunk.get("done_reason") == "length":
+                                # Cut off at num_predict: not a usable answer, and caching it would replay the failure
+                                raise RuntimeError("Ollama response truncated at the token limit")
+                            done = True
+        except httpx.ConnectError:
+            # Ollama went away; re-probe on the next request instead of waiting out the TTL
+            self._probed_at = None
+            raise
+        
+        # Without the done line the stream ended early, and the text may be cut off
+        if parts and done:
+            await self._cache.aset(key, "".join(parts))
+    
     def analyze_resume_keywords(self, resume_text: str, keywords: List[str]) -> Dict[str, Any]:
         """Analyze which keywords are present in the resume"""
-        keyword_analysis = {}
+        resume_lower = resume_text.lower()
+        if len(resume_lower) != len(resume_text):
+            # Some characters change length when lower-cased, so match offsets
+            # would not line up with the original text
+            return self._analyze_keywords_with_regex(resume_text, keywords)
         
+        # Single-token keywords are looked up among the resume's tokens; only
+        # multi-word or punctuated keywords need the Aho-Corasick scan
+        single_tokens = set()
+        automaton = ahocorasick.Automaton()
         for keyword in keywords:
-            # Case-insensitive search
-            pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-            matches = pattern.findall(resume_text)
-            frequency = len(matches)
+            keyword_lower = keyword.lower()
+            if not keyword_lower:
+                continue
+            if _TOKEN_RE.fullmatch(keyword_lower) and not keyword_lower.endswith('.'):
+                single_tokens.add(keyword_lower)
+            else:
+                automaton.add_word(keyword_lower, keyword_lower)
+        
+        frequency = {}
+        context = {}
+        
+        def record_match(keyword_lower: str, start: int, end: int) -> None:
+            count = frequency.get(keyword_lower, 0)
+            frequency[keyword_lower] = count + 1
             
-            # Get context around matches
+            # Get context around the first 3 matches
+            if count < 3:
+                context.setdefault(keyword_lower, []).append(
+                    resume_text[max(0, start - 50):end + 50].strip()
+                )
+        
+        if single_tokens:
+            for match in _TOKEN_RE.finditer(resume_lower):
+                # Drop sentence-ending periods ("Python." -> "python")
+                token = match.group().rstrip('.')
+                if token in single_tokens:
+                    record_match(token, match.start(), match.start() + len(token))
+        
+        if len(automaton):
+            automaton.make_automaton()
+            last_end = {}
+            for end, keyword_lower in automaton.iter(resume_lower):
+                start = end + 1 - len(keyword_lower)
+                # Skip overlapping hits of the same keyword, as a regex scan would
+                if start < last_end.get(keyword_lower, 0):
+                    continue
+                last_end[keyword_lower] = end + 1
+                record_match(keyword_lower, start, end + 1)
+        
+        keyword_analysis = {}
+        for keyword in keywords:
+            keyword_lower = keyword.lower()
+            count = frequency.get(keyword_lower, 0)
+            keyword_analysis[keyword] = {
+                "found": count > 0,
+                "frequency": count,
+                # Copied so keywords differing only in case don't share a list
+                "context": list(context[keyword_lower]) if count else []
+            }
+        
+        return keyword_analysis
+    
+    def _analyze_keywords_with_regex(self, resume_text: str, keywords: List[str]) -> Dict[str, Any]:
+        """Analyze keyword presence with one case-insensitive regex scan per keyword"""
+        keyword_analysis = {}
+        
+        for keyword in keywords:
+            # Case-insensitive search, one scan per keyword; count every match
+            # but only keep context around the first 3
+            frequency = 0
             context = []
-            for match in pattern.finditer(resume_text):
-                start = max(0, match.start() - 50)
-                end = min(len(resume_text), match.end() + 50)
-                context.append(resume_text[start:end].strip())
+            for match in _keyword_pattern(keyword).finditer(resume_text):
+                frequency += 1
+                if frequency <= 3:
+                    start = max(0, match.start() - 50)
+                    end = min(len(resume_text), match.end() + 50)
+                    context.append(resume_text[start:end].strip())
             
             keyword_analysis[keyword] = {
                 "found": frequency > 0,
                 "frequency": frequency,
-                "context": context[:3]  # Limit to first 3 contexts
+                "context": context
             }
         
         return keyword_analysis
     
-    def tailor_resume(self, resume_text: str, job_description: str, target_role: str = None) -> str:
+    def _tailor_prompt(self, resume_text: str, job_description: str, target_role: str = None) -> str:
+        """Build the OpenAI prompt for tailoring a resume"""
+        return f"""
+        You are an expert resume writer and career coach. Your task is to optimize a resume to better match a specific job description.
+        
+        Job Description:
+        {_truncate_tokens(job_description)}
+        
+        Target Role: {target_role or "Not specified"}
+        
+        Original Resume:
+        {_truncate_tokens(resume_text)}
+        
+        Please optimize the resume by:
+        1. Incorporating relevant keywords from the job description naturally
+        2. Highlighting relevant experience and skills
+        3. Using action verbs and quantifiable achievements
+        4. Ensuring ATS (Applicant Tracking System) compatibility
+        5. Maintaining professional tone and formatting
+        
+        Return the optimized resume text. Keep the same general structure but enhance the content to better match the job requirements.
+        """
+    
+    def _suggestions_prompt(self, resume_text: str, job_description: str, keyword_analysis: Dict[str, Any]) -> str:
+        """Build the OpenAI prompt for improvement suggestions"""
+        missing_keywords = [kw for kw, data in keyword_analysis.items() if not data["found"]]
+        
+        return f"""
+        Based on the following information, provide specific, actionable suggestions to improve the resume:
+        
+        Job Description:
+        {_truncate_tokens(job_description)}
+        
+        Resume:
+        {_truncate_tokens(resume_text)}
+        
+        Missing Keywords: {', '.join(missing_keywords[:10])}
+        
+        Provide 5-7 specific suggestions that would help this resume better match the job requirements.
+        Focus on practical improvements that can be implemented.
+        """
+    
+    def _parse_suggestions(self, content: str) -> List[str]:
+        """Split an OpenAI suggestions response into individual suggestions"""
+        suggestions = content.strip().split('\n')
+        return [s.strip() for s in suggestions if s.strip()]
+    
+    async def tailor_resume(self, resume_text: str, job_description: str, target_role: str = None) -> str:
         """Tailor the resume to better match the job description"""
+        await self._ensure_client()
         if self.client == "ollama":
-            return self._tailor_resume_with_ollama(resume_text, job_description, target_role)
+            return await self._tailor_resume_with_ollama(resume_text, job_description, target_role)
         elif not self.client:
             logger.warning("No AI client available. Returning original resume.")
             return resume_text
         else:
             # OpenAI client
-            prompt = f"""
-            You are an expert resume writer and career coach. Your task is to optimize a resume to better match a specific job description.
-            
-            Job Description:
-            {job_description}
-            
-            Target Role: {target_role or "Not specified"}
-            
-            Original Resume:
-            {resume_text}
-            
-            Please optimize the resume by:
-            1. Incorporating relevant keywords from the job description naturally
-            2. Highlighting relevant experience and skills
-            3. Using action verbs and quantifiable achievements
-            4. Ensuring ATS (Applicant Tracking System) compatibility
-            5. Maintaining professional tone and formatting
-            
-            Return the optimized resume text. Keep the same general structure but enhance the content to better match the job requirements.
-            """
+            prompt = self._tailor_prompt(resume_text, job_description, target_role)
             
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3
-                )
+                content = await self._cached_chat(prompt, temperature=0.3)
                 
-                return response.choices[0].message.content.strip()
+                return content.strip()
                 
             except Exception as e:
                 logger.error(f"Error tailoring resume: {e}")
                 return resume_text
     
-    def _tailor_resume_with_ollama(self, resume_text: str, job_description: str, target_role: str = None) -> str:
-        """Tailor resume using Ollama"""
+    async def tailor_resume_stream(self, resume_text: str, job_description: str, target_role: str = None) -> AsyncIterator[str]:
+        """Tailor the resume, yielding the text as it is generated"""
+        await self._ensure_client()
+        if not self.client:
+            logger.warning("No AI client available. Returning original resume.")
+            yield resume_text
+        else:
+            if self.client == "ollama":
+                system_prompt, prompt = self._ollama_tailor_prompts(resume_text, job_description, target_role)
+                deltas = self._stream_ollama(prompt, system_prompt)
+            else:
+                prompt = self._tailor_prompt(resume_text, job_description, target_role)
+                deltas = self._stream_chat(prompt, temperature=0.3)
+            
+            streamed = False
+            try:
+                async for delta in deltas:
+                    streamed = True
+                    yield delta
+            except Exception as e:
+                logger.error(f"Error streaming tailored resume: {e}")
+            
+            if not streamed:
+                yield resume_text
+    
+    def _ollama_tailor_prompts(self, resume_text: str, job_description: str, target_role: str = None) -> Tuple[str, str]:
+        """Build the Ollama system prompt and prompt for tailoring a resume"""
         system_prompt = """You are an expert resume writer. Rewrite the resume to better match the job description while maintaining truthfulness and professional tone."""
         
         prompt = f"""
         Job Description:
-        {job_description}
+        {_truncate_tokens(job_description)}
         
         Target Role: {target_role or "Not specified"}
         
         Original Resume:
-        {resume_text}
+        {_truncate_tokens(resume_text)}
         
         Rewrite this resume to better match the job description. Focus on:
         1. Highlighting relevant skills and experiences
@@ -226,9 +986,14 @@ class AIService:
         
         Return only the rewritten resume text, no explanations.
         """
+        return system_prompt, prompt
+    
+    async def _tailor_resume_with_ollama(self, resume_text: str, job_description: str, target_role: str = None) -> str:
+        """Tailor resume using Ollama"""
+        system_prompt, prompt = self._ollama_tailor_prompts(resume_text, job_description, target_role)
         
         try:
-            tailored_resume = self._call_ollama(prompt, system_prompt)
+            tailored_resume = await self._call_ollama(prompt, system_prompt)
             if tailored_resume and len(tailored_resume) > 100:
                 return tailored_resume
             else:
@@ -237,47 +1002,49 @@ class AIService:
             logger.error(f"Error tailoring resume with Ollama: {e}")
             return resume_text
     
-    def generate_improvement_suggestions(self, resume_text: str, job_description: str, keyword_analysis: Dict[str, Any]) -> List[str]:
+    async def generate_improvement_suggestions(self, resume_text: str, job_description: str, keyword_analysis: Dict[str, Any]) -> List[str]:
         """Generate specific suggestions for resume improvement"""
+        await self._ensure_client()
         if self.client == "ollama":
-            return self._generate_suggestions_with_ollama(resume_text, job_description, keyword_analysis)
+            return await self._generate_suggestions_with_ollama(resume_text, job_description, keyword_analysis)
         elif not self.client:
             logger.warning("No AI client available. Using fallback suggestions.")
             return self._fallback_suggestions(resume_text, job_description, keyword_analysis)
         else:
             # OpenAI client
-            missing_keywords = [kw for kw, data in keyword_analysis.items() if not data["found"]]
-            
-            prompt = f"""
-            Based on the following information, provide specific, actionable suggestions to improve the resume:
-            
-            Job Description:
-            {job_description}
-            
-            Resume:
-            {resume_text}
-            
-            Missing Keywords: {', '.join(missing_keywords[:10])}
-            
-            Provide 5-7 specific suggestions that would help this resume better match the job requirements.
-            Focus on practical improvements that can be implemented.
-            """
+            prompt = self._suggestions_prompt(resume_text, job_description, keyword_analysis)
             
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.4
-                )
+                content = await self._cached_chat(prompt, temperature=0.4)
                 
-                suggestions = response.choices[0].message.content.strip().split('\n')
-                return [s.strip() for s in suggestions if s.strip()]
+                return self._parse_suggestions(content)
                 
             except Exception as e:
                 logger.error(f"Error generating suggestions: {e}")
                 return self._fallback_suggestions(resume_text, job_description, keyword_analysis)
     
-    def _generate_suggestions_with_ollama(self, resume_text: str, job_description: str, keyword_analysis: Dict[str, Any]) -> List[str]:
+    async def generate_improvement_suggestions_stream(self, resume_text: str, job_description: str, keyword_analysis: Dict[str, Any]) -> AsyncIterator[str]:
+        """Generate improvement suggestions, yielding the text as it is generated"""
+        await self._ensure_client()
+        if self.client and self.client != "ollama":
+            prompt = self._suggestions_prompt(resume_text, job_description, keyword_analysis)
+            
+            streamed = False
+            try:
+                async for delta in self._stream_chat(prompt, temperature=0.4):
+                    streamed = True
+                    yield delta
+                return
+            except Exception as e:
+                logger.error(f"Error streaming suggestions: {e}")
+                if streamed:
+                    return
+        
+        # Ollama and fallback suggestions are produced in one piece
+        suggestions = await self.generate_improvement_suggestions(resume_text, job_description, keyword_analysis)
+        yield "\n".join(suggestions)
+    
+    async def _generate_suggestions_with_ollama(self, resume_text: str, job_description: str, keyword_analysis: Dict[str, Any]) -> List[str]:
         """Generate suggestions using Ollama"""
         system_prompt = """You are a career coach and resume expert. Provide specific, actionable suggestions for improving resumes."""
         
@@ -285,13 +1052,13 @@ class AIService:
         
         prompt = f"""
         Resume:
-        {resume_text}
+        {_truncate_tokens(resume_text)}
         
         Job Description:
-        {job_description}
+        {_truncate_tokens(job_description)}
         
         Keyword Analysis:
-        {json.dumps(keyword_analysis, indent=2)}
+        {orjson.dumps(keyword_analysis, option=orjson.OPT_INDENT_2).decode()}
         
         Provide 5-7 specific, actionable suggestions to improve this resume for this job. 
         Focus on:
@@ -305,7 +1072,7 @@ class AIService:
         """
         
         try:
-            suggestions_text = self._call_ollama(prompt, system_prompt)
+            suggestions_text = await self._call_ollama(prompt, system_prompt)
             
             # Parse suggestions into a list
             suggestions = []
@@ -329,81 +1096,32 @@ class AIService:
     
     def calculate_confidence_score(self, keyword_analysis: Dict[str, Any], keywords: List[Dict[str, Any]]) -> float:
         """Calculate a confidence score for how well the resume matches the job"""
-        if not keywords:
-            return 0.0
-        
-        total_importance = sum(kw.get('importance', 0) for kw in keywords)
-        if total_importance == 0:
-            return 0.0
-        
+        # Accumulate total and matched importance in a single pass
+        total_importance = 0
         matched_importance = 0
         for kw_data in keywords:
-            keyword = kw_data.get('keyword', '')
             importance = kw_data.get('importance', 0)
+            total_importance += importance
             
-            if keyword in keyword_analysis and keyword_analysis[keyword]['found']:
+            analysis = keyword_analysis.get(kw_data.get('keyword', ''))
+            if analysis and analysis['found']:
                 matched_importance += importance
         
+        if total_importance == 0:
+            return 0.0
+        
         return min(1.0, matched_importance / total_importance)
     
     def _fallback_keyword_extraction(self, job_description: str) -> List[Dict[str, Any]]:
         """Fallback keyword extraction when OpenAI is not available"""
-        # Simple keyword extraction based on common patterns
-        import re
-        
-        # Common technical skills
-        technical_keywords = [
-            'python', 'java', 'javascript', 'react', 'node.js', 'sql', 'aws', 'docker',
-            'kubernetes', 'machine learning', 'ai', 'data science', 'git', 'agile',
-            'scrum', 'api', 'rest', 'graphql', 'html', 'css', 'typescript', 'angular',
-            'vue.js', 'mongodb', 'postgresql', 'mysql', 'redis', 'elasticsearch',
-            'kafka', 'spark', 'hadoop', 'tensorflow', 'pytorch', 'scikit-learn'
-        ]
-        
-        # Common soft skills
-        soft_skills = [
-            'leadership', 'communication', 'teamwork', 'problem solving', 'analytical',
-            'creative', 'organized', 'detail-oriented', 'time management', 'collaboration',
-            'mentoring', 'project management', 'customer service', 'sales', 'marketing'
-        ]
-        
-        # Common tools
-        tools = [
-            'jira', 'confluence', 'slack', 'teams', 'zoom', 'figma', 'sketch',
-            'photoshop', 'illustrator', 'excel', 'powerpoint', 'word', 'outlook'
+        return [
+            {
+                'keyword': keyword,
+                'importance': importance,
+                'category': category
+            }
+            for keyword, importance, category in (_FALLBACK_KEYWORDS[index] for index in _FALLBACK_MATCHER.indices(job_description))
         ]
-        
-        found_keywords = []
-        job_lower = job_description.lower()
-        
-        # Check for technical skills
-        for keyword in technical_keywords:
-            if keyword in job_lower:
-                found_keywords.append({
-                    'keyword': keyword,
-                    'importance': 0.8,
-                    'category': 'technical'
-                })
-        
-        # Check for soft skills
-        for keyword in soft_skills:
-            if keyword in job_lower:
-                found_keywords.append({
-                    'keyword': keyword,
-                    'importance': 0.6,
-                    'category': 'soft_skill'
-                })
-        
-        # Check for tools
-        for keyword in tools:
-            if keyword in job_lower:
-                found_keywords.append({
-                    'keyword': keyword,
-                    'importance': 0.7,
-                    'category': 'tool'
-                })
-        
-        return found_keywords
     
     def _fallback_suggestions(self, resume_text: str, job_description: str, keyword_analysis: Dict[str, Any]) -> List[str]:
         """Fallback suggestions when OpenAI is not available"""
@@ -427,55 +1145,50 @@ class AIService:
         """Fallback section analysis when OpenAI is not available"""
         sections = []
         
-        # Simple section detection based on common headers
+        def add_section(name: str, section_lines: List[str]) -> None:
+            # Blank lines are dropped from section content
+            content = '\n'.join(line for line in section_lines if line.strip()).strip()
+            if content:
+                sections.append({
+                    'section_name': name.title(),
+                    'content': content
+                })
+        
+        # Simple section detection based on common headers. One scan of the
+        # lower-cased text finds the lines containing any section keyword; lower()
+        # never adds or removes line breaks, so line numbers match the original
         lines = resume_text.split('\n')
-        current_section = "Summary"
-        current_content = []
-        
-        section_keywords = {
-            'experience': ['experience', 'work history', 'employment', 'career'],
-            'education': ['education', 'academic', 'degree', 'university', 'college'],
-            'skills': ['skills', 'technical skills', 'competencies', 'expertise'],
-            'summary': ['summary', 'objective', 'profile', 'about'],
-            'projects': ['projects', 'portfolio', 'achievements'],
-            'certifications': ['certifications', 'certificates', 'licenses']
-        }
+        resume_lower = resume_text.lower()
+        lines_lower = resume_lower.split('\n')
+        line_ends = list(itertools.accumulate(len(line) + 1 for line in lines_lower))
         
-        for line in lines:
-            line_lower = line.lower().strip()
-            
-            # Check if this line is a section header
-            is_header = False
-            for section_name, keywords in section_keywords.items():
-                if any(keyword in line_lower for keyword in keywords):
-                    # Save previous section
-                    if current_content:
-                        sections.append({
-                            'section_name': current_section.title(),
-                            'content': '\n'.join(current_content).strip()
-                        })
-                    
-                    current_section = section_name.title()
-                    current_content = []
-                    is_header = True
-                    break
-            
-            if not is_header and line.strip():
-                current_content.append(line)
+        header_lines = {}
+        for end, _ in _SECTION_AUTOMATON.iter(resume_lower):
+            index = bisect.bisect_right(line_ends, end)
+            if index not in header_lines:
+                # The first section with a keyword in the line names the header
+                header_lines[index] = next(
+                    name for name, keywords in _SECTION_KEYWORDS.items()
+                    if any(keyword in lines_lower[index] for keyword in keywords)
+                )
+        
+        current_section = "Summary"
+        content_start = 0
+        for index, section_name in header_lines.items():
+            add_section(current_section, lines[content_start:index])
+            current_section = section_name
+            content_start = index + 1
         
         # Add the last section
-        if current_content:
-            sections.append({
-                'section_name': current_section.title(),
-                'content': '\n'.join(current_content).strip()
-            })
+        add_section(current_section, lines[content_start:])
         
         return sections
     
-    def analyze_resume_sections(self, resume_text: str) -> List[Dict[str, str]]:
+    async def analyze_resume_sections(self, resume_text: str) -> List[Dict[str, str]]:
         """Analyze and identify different sections of the resume"""
+        await self._ensure_client()
         if self.client == "ollama":
-            return self._analyze_sections_with_ollama(resume_text)
+            return await self._analyze_sections_with_ollama(resume_text)
         elif not self.client:
             logger.warning("No AI client available. Using fallback section analysis.")
             return self._fallback_section_analysis(resume_text)
@@ -487,44 +1200,40 @@ class AIService:
             2. The content of that section
             
             Resume:
-            {resume_text}
+            {_truncate_tokens(resume_text)}
             
-            Return as JSON array with objects containing "section_name" and "content".
+            Return as a JSON object with a "sections" array of objects containing "section_name" and "content".
             """
             
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.1
-                )
+                content = await self._cached_chat(prompt, temperature=0.1, json_mode=True, model=self.model_light)
                 
-                sections = json.loads(response.choices[0].message.content)
+                sections = orjson.loads(content)["sections"]
                 return sections
                 
             except Exception as e:
                 logger.error(f"Error analyzing resume sections: {e}")
                 return self._fallback_section_analysis(resume_text)
     
-    def _analyze_sections_with_ollama(self, resume_text: str) -> List[Dict[str, str]]:
+    async def _analyze_sections_with_ollama(self, resume_text: str) -> List[Dict[str, str]]:
         """Analyze resume sections using Ollama"""
         system_prompt = """You are an expert resume analyzer. Identify and extract resume sections in JSON format."""
         
         prompt = f"""
         Analyze this resume and identify its main sections:
         
-        {resume_text}
+        {_truncate_tokens(resume_text)}
         
         Return as JSON array with objects containing "section_name" and "content".
         """
         
         try:
-            response = self._call_ollama(prompt, system_prompt)
+            response = await self._call_ollama(prompt, system_prompt)
             
             # Try to extract JSON
             json_match = re.search(r'\[.*\]', response, re.DOTALL)
             if json_match:
-                sections = json.loads(json_match.group())
+                sections = orjson.loads(json_match.group())
                 return sections
             else:
                 return self._fallback_section_analysis(resume_text)
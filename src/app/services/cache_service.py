@@ -0,0 +1,245 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+import orjson
+import numpy as np
+from typing import List, Tuple, Optional, Dict, Any
+from cachetools import TTLCache
+from loguru import logger
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "resume-tailor", "llm.sqlite")
+
+# Expiry given to rows written before rows carried their own; the longest TTL any owner used
+_LEGACY_TTL = 7 * 24 * 3600
+
+# Cosine similarity an embedding must reach to reuse another prompt's response.
+# Errs towards misses, since a false hit returns another posting's keywords;
+# tune it per embedding model against labelled duplicate / distinct pairs.
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+
+def _unit_vector(embedding: List[float]) -> Optional[np.ndarray]:
+    """Embedding as a unit-length float32 vector; None if it is empty or zero"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector)) if vector.ndim == 1 else 0.0
+    if not norm:
+        return None
+    return vector / norm
+
+class _EmbeddingIndex:
+    """Fixed-capacity ring of unit embeddings for one namespace and dimension, scanned with one matrix product"""
+    
+    def __init__(self, capacity: int, dim: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires = np.zeros(capacity)
+        self.values: List[Optional[str]] = [None] * capacity
+        self.size = 0
+        self._next = 0
+    
+    def add(self, vector: np.ndarray, value: str, expires: float) -> None:
+        """Store an entry, overwriting the oldest once full"""
+        slot = self._next
+        self.vectors[slot] = vector
+        self.expires[slot] = expires
+        self.values[slot] = value
+        self._next = (slot + 1) % len(self.values)
+        self.size = min(self.size + 1, len(self.values))
+    
+    def search(self, vector: np.ndarray, now: float, threshold: float) -> Optional[str]:
+        """Value of the most similar unexpired entry, if it clears the threshold"""
+        if not self.size:
+            return None
+        scores = self.vectors[:self.size] @ vector
+        scores[self.expires[:self.size] < now] = -1.0
+        best = int(np.argmax(scores))
+        return self.values[best] if scores[best] >= threshold else None
+
+class ResponseCache:
+    """LLM response cache: an in-memory TTLCache in front of a SQLite file that survives restarts"""
+    
+    def __init__(self, path: Optional[str] = None, maxsize: int = 1000, ttl: float = 7 * 24 * 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Semantic tier, one index per (namespace, dimension); callers may use it from worker threads
+        self._embeddings: Dict[Tuple[str, int], _EmbeddingIndex] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        
+        path = os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH) if path is None else path
+        if path:
+            self._open(path)
+    
+    def _open(self, path: str) -> None:
+        """Open the SQLite store, dropping expired rows; stays memory-only on failure"""
+        path = os.path.expanduser(path)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, expires REAL NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS embeddings (namespace TEXT NOT NULL, embedding BLOB NOT NULL, value TEXT NOT NULL, created REAL NOT NULL, expires REAL NOT NULL)")
+            for table in ("responses", "embeddings"):
+                if "expires" not in {column[1] for column in db.execute(f"PRAGMA table_info({table})")}:
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN expires REAL")
+                    db.execute(f"UPDATE {table} SET expires = created + ?", (_LEGACY_TTL,))
+            
+            # Several caches with different TTLs may share the file, so each row expires on its own clock
+            now = time.time()
+            db.execute("DELETE FROM responses WHERE expires < ?", (now,))
+            db.execute("DELETE FROM embeddings WHERE expires < ?", (now,))
+            db.commit()
+            
+            rows = db.execute(
+                "SELECT namespace, embedding, value, expires FROM embeddings ORDER BY created DESC LIMIT ?",
+                (self.maxsize,)
+            ).fetchall()
+            for namespace, embedding, value, expires in reversed(rows):
+                vector = _unit_vector(orjson.loads(embedding))
+                if vector is not None:
+                    self._index(namespace, len(vector)).add(vector, value, expires)
+            
+            self._db = db
+            logger.info(f"LLM response cache persisted to {path}")
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Could not open LLM cache at {path}, caching in memory only: {e}")
+    
+    def _read(self, key: str) -> Optional[str]:
+        """Read an unexpired response from disk"""
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value FROM responses WHERE key = ? AND expires >= ?",
+                    (key, time.time())
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+        return row[0] if row is not None else None
+    
+    def _write(self, key: str, value: str) -> None:
+        """Write a response to disk"""
+        try:
+            created = time.time()
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, expires) VALUES (?, ?, ?, ?)",
+                    (key, value, created, created + self.ttl)
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache write failed: {e}")
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, checking memory before disk"""
+        value = self._memory.get(key)
+        if value is not None or self._db is None:
+            return value
+        
+        value = self._read(key)
+        if value is not None:
+            self._memory[key] = value
+        return value
+    
+    def set(self, key: str, value: str) -> None:
+        """Store a response in memory and on disk"""
+        self._memory[key] = value
+        if self._db is not None:
+            self._write(key, value)
+    
+    async def aget(self, key: str) -> Optional[str]:
+        """Async variant of get; a memory hit stays on the event loop, a disk read runs in a thread"""
+        value = self._memory.get(key)
+        if value is not None or self._db is None:
+            return value
+        
+        value = await asyncio.to_thread(self._read, key)
+        if value is not None:
+            self._memory[key] = value
+        return value
+    
+    async def aset(self, key: str, value: str) -> None:
+        """Async variant of set; the disk write and commit run in a thread"""
+        self._memory[key] = value
+        if self._db is not None:
+            await asyncio.to_thread(self._write, key, value)
+    
+    def _index(self, namespace: str, dim: int) -> _EmbeddingIndex:
+        """Embedding index for a namespace and dimension, created on first use"""
+        index = self._embeddings.get((namespace, dim))
+        if index is None:
+            index = self._embeddings[(namespace, dim)] = _EmbeddingIndex(self.maxsize, dim)
+        return index
+    
+    def get_similar(self, namespace: str, embedding: List[float], threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> Optional[str]:
+        """
+        Return the response stored for the most similar embedding, if it clears the threshold.
+        
+        Scans up to maxsize vectors (~1 ms for 1000 x 4096); async callers use aget_similar.
+        """
+        vector = _unit_vector(embedding)
+        if vector is None:
+            return None
+        
+        with self._lock:
+            index = self._embeddings.get((namespace, len(vector)))
+            if index is None:
+                return None
+            return index.search(vector, time.time(), threshold)
+    
+    def set_similar(self, namespace: str, embedding: List[float], value: str) -> None:
+        """Store a response under an embedding for similarity lookups; async callers use aset_similar"""
+        vector = _unit_vector(embedding)
+        if vector is None:
+            return
+        
+        created = time.time()
+        with self._lock:
+            self._index(namespace, len(vector)).add(vector, value, created + self.ttl)
+            if self._db is None:
+                return
+            
+            try:
+                self._db.execute(
+                    "INSERT INTO embeddings (namespace, embedding, value, created, expires) VALUES (?, ?, ?, ?, ?)",
+                    (namespace, orjson.dumps(vector, option=orjson.OPT_SERIALIZE_NUMPY), value, created, created + self.ttl)
+                )
+                # Keep the table to what the in-memory ring can hold, so a long-running process does not grow it
+                self._db.execute("DELETE FROM embeddings WHERE expires < ?", (created,))
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE namespace = ? AND rowid NOT IN "
+                    "(SELECT rowid FROM embeddings WHERE namespace = ? ORDER BY created DESC LIMIT ?)",
+                    (namespace, namespace, self.maxsize)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache write failed: {e}")
+    
+    async def aget_similar(self, namespace: str, embedding: List[float], threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> Optional[str]:
+        """Async variant of get_similar; the scan runs in a thread"""
+        return await asyncio.to_thread(self.get_similar, namespace, embedding, threshold)
+    
+    async def aset_similar(self, namespace: str, embedding: List[float], value: str) -> None:
+        """Async variant of set_similar; the index update and disk write run in a thread"""
+        await asyncio.to_thread(self.set_similar, namespace, embedding, value)
+    
+    def __len__(self) -> int:
+        return len(self._memory)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Size and configuration of the cache"""
+        return {
+            "size": len(self._memory),
+            "semantic_size": sum(index.size for index in self._embeddings.values()),
+            "max_size": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "persistent": self._db is not None
+        }
+    
+    def close(self) -> None:
+        """Close the SQLite store"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,49 @@
+import os
+import ahocorasick
+import httpx
+import orjson
+from typing import List, Tuple, Iterable, Optional
+from loguru import logger
+
+class KeywordMatcher:
+    """Finds which of a fixed list of keywords occur in a text, in a single scan"""
+    
+    def __init__(self, keywords: Iterable[str]):
+        # Built once per keyword list, so each lookup is one pass of a multi-pattern automaton
+        self._automaton = ahocorasick.Automaton()
+        for index, keyword in enumerate(keywords):
+            self._automaton.add_word(keyword, index)
+        self._automaton.make_automaton()
+    
+    def indices(self, text: str) -> Tuple[int, ...]:
+        """Indices of the keywords found in text, in keyword-list order"""
+        return tuple(sorted({index for _, index in self._automaton.iter(text.lower())}))
+
+class OllamaEmbeddings:
+    """
+    Request and response handling for Ollama's /api/embeddings.
+    
+    Embeddings for the semantic cache come from a dedicated embedding model
+    (OLLAMA_EMBED_MODEL), not the chat model. Callers send the request with
+    their own client and check missing first: a 404 means the model is not
+    pulled, and it is not asked for again until restart.
+    """
+    
+    def __init__(self):
+        self.model = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+        self.missing = False
+    
+    def payload(self, text: str) -> bytes:
+        """Serialize the request body for /api/embeddings"""
+        return orjson.dumps({"model": self.model, "prompt": text})
+    
+    def parse(self, response: httpx.Response) -> Optional[List[float]]:
+        """Embedding from an /api/embeddings response; None on error"""
+        if response.status_code == 200:
+            return orjson.loads(response.content).get("embedding") or None
+        if response.status_code == 404:
+            self.missing = True
+            logger.warning(f"Ollama embedding model {self.model} not found, semantic cache disabled (run `ollama pull {self.model}`)")
+            return None
+        logger.warning(f"Ollama embeddings error: {response.status_code}")
+        return None
@@ -1,250 +1,776 @@
 import os
 import re
-import json
-import requests
-from typing import List, Dict, Tuple, Any
+import asyncio
+import orjson
+import time
+import socket
+import hashlib
+import textwrap
+import threading
+import functools
+import httpx
+from typing import List, Dict, Tuple, Any, Optional, Callable, NamedTuple
 from loguru import logger
+from .cache_service import ResponseCache
+from .ollama_common import KeywordMatcher, OllamaEmbeddings
+
+# Wall-clock limit on a whole call, matching AIService. Local generation can take minutes,
+# so there is no shorter per-read timeout for a slow first token to trip
+GENERATE_DEADLINE = 300.0
+
+# Opt-in response cache, kept for a day so edited prompts and model updates show through
+CACHE_ENABLED = os.getenv("RESUME_TAILOR_CACHE", "false").lower() in ("1", "true", "yes")
+CACHE_TTL = 24 * 3600
+
+# How long a connection probe result is reused, and how long a probe may take
+PROBE_TTL = 30.0
+PROBE_TIMEOUT = 0.5
+
+# Per-task generation options; num_predict caps output at each task's expected length,
+# and temperature 0 keeps the structured extractions deterministic so repeats hit the cache
+KEYWORD_OPTIONS = {"num_predict": 512, "temperature": 0.0}
+TAILOR_OPTIONS = {"num_predict": 2048}
+SUGGESTIONS_OPTIONS = {"num_predict": 400}
+SECTIONS_OPTIONS = {"num_predict": 800, "temperature": 0.0}
+COMBINED_OPTIONS = {"num_predict": 4096}
+
+# Request bodies are serialized with orjson and sent as raw content
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Characters that affect bracket depth or string state, per JSON container type
+_JSON_TOKEN_RES = {
+    '[': re.compile(r'[\[\]"\\]'),
+    '{': re.compile(r'[{}"\\]')
+}
+_BULLET_RE = re.compile(r'^[\d\-•\.\s]+')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+
+def _compact_prompt(text: str) -> str:
+    """Dedent a prompt template and collapse blank runs, so indentation is not sent as prefill tokens"""
+    return _BLANK_LINES_RE.sub("\n\n", textwrap.dedent(text)).strip()
+
+# Shared by every chat so calls over the same resume and job description start with identical bytes
+_CONTEXT_SYSTEM_PROMPT = """You are an expert resume writer, resume analyzer and career coach. Use the resume and job description provided, then complete the task in the final message exactly as instructed."""
+
+# Task instructions, sent as the final user message after the shared context
+_KEYWORDS_TASK = _compact_prompt("""
+Analyze the job description and extract the most important keywords, skills, and requirements.
+Return your response as a JSON array with objects containing: keyword, importance (0-1), and category (technical, soft_skill, tool, qualification, or experience).
+
+Return as JSON array with objects: [{"keyword": "skill", "importance": 0.8, "category": "technical"}]
+Only return valid JSON, no other text.
+""")
+
+_TAILOR_TASK = _compact_prompt("""
+Rewrite this resume to better match the job description. Focus on:
+1. Highlighting relevant skills and experiences
+2. Using keywords from the job description
+3. Emphasizing achievements that align with the role
+4. Maintaining professional tone and truthfulness
+
+Return only the rewritten resume text, no explanations.
+""")
+
+_SUGGESTIONS_TASK = _compact_prompt("""
+Keyword Analysis:
+{keyword_analysis}
+
+Provide 5-7 specific, actionable suggestions to improve this resume for this job.
+Focus on:
+1. Adding missing keywords
+2. Improving bullet points
+3. Quantifying achievements
+4. ATS optimization
+5. Professional presentation
+
+Return as a numbered list of suggestions.
+""")
+
+_SECTIONS_TASK = _compact_prompt("""
+Analyze this resume and provide insights about each section in JSON format.
+
+Return as JSON with sections: experience, education, skills, summary, strengths, weaknesses, suggestions.
+""")
+
+_COMBINED_TASK = _compact_prompt("""
+Analyze the resume against the job description and return a single JSON object with these fields:
+- "keywords": array of the most important keywords, skills, and requirements from the job description, each an object with "keyword", "importance" (0-1), and "category" ("technical", "soft_skill", "tool", "qualification", or "experience")
+- "tailored_resume": the full resume rewritten to better match the job description. Incorporate relevant keywords naturally, highlight relevant experience, use action verbs and quantifiable achievements, keep it ATS-friendly and truthful, and keep the same general structure
+- "suggestions": array of 5-7 specific, actionable suggestions (strings) to improve this resume for this job
+- "sections": object with experience, education, skills, summary, strengths, weaknesses, suggestions
+
+Target Role: {target_role}
+
+Return only the JSON object, no other text.
+""")
+
+# Common technical keywords recognized by the fallback extractor
+_FALLBACK_KEYWORDS = [
+    'python', 'java', 'javascript', 'sql', 'html', 'css', 'react', 'node.js', 'aws', 'azure',
+    'machine learning', 'ai', 'data science', 'analytics', 'database', 'api', 'git', 'docker',
+    'kubernetes', 'agile', 'scrum', 'project management', 'leadership', 'communication'
+]
+
+_FALLBACK_MATCHER = KeywordMatcher(_FALLBACK_KEYWORDS)
+
+# Memoized because the fallback runs on every call while Ollama is down or returns no JSON
+@functools.lru_cache(maxsize=256)
+def _fallback_keyword_indices(job_description: str) -> Tuple[int, ...]:
+    """Indices into _FALLBACK_KEYWORDS of the keywords found in a job description"""
+    return _FALLBACK_MATCHER.indices(job_description)
+
+def _extract_first_json(text: str, open_char: str) -> Optional[Tuple[int, int]]:
+    """
+    Find the first balanced JSON array ('[') or object ('{') in text.
+    
+    Walks the structural characters once, tracking string and escape state,
+    and returns the (start, end) slice bounds, or None if no container closes.
+    """
+    start = text.find(open_char)
+    if start < 0:
+        return None
+    
+    depth = 0
+    in_string = False
+    skip_to = start
+    for match in _JSON_TOKEN_RES[open_char].finditer(text, start):
+        index = match.start()
+        if index < skip_to:
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                skip_to = index + 2
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == open_char:
+            depth += 1
+        elif char != '\\':
+            depth -= 1
+            if depth == 0:
+                return start, index + 1
+    return None
+
+def _loads_first_json(text: str, open_char: str) -> Any:
+    """
+    Parse the JSON array ('[') or object ('{') embedded in an LLM response.
+    
+    The span from the first opening to the last closing bracket is tried
+    first, which is one C-level find each way and covers responses with plain
+    surrounding prose. If that span does not parse (e.g. trailing text that
+    itself contains brackets), the first balanced container is used instead.
+    Returns None when the response has no container at all.
+    """
+    start = text.find(open_char)
+    end = text.rfind(']' if open_char == '[' else '}') + 1
+    if start < 0 or end <= start:
+        return None
+    
+    try:
+        return orjson.loads(text[start:end])
+    except orjson.JSONDecodeError:
+        span = _extract_first_json(text, open_char)
+        if span is None or span[1] == end:
+            raise
+        return orjson.loads(text[span[0]:span[1]])
+
+class _ChatTask(NamedTuple):
+    """One chat request for OllamaService._run_task, with how to read its response and what to return without one"""
+    messages: List[Dict[str, str]]
+    options: Dict[str, Any]
+    # Returns None for an unusable response, which falls back like an error does
+    parse: Callable[[str], Any]
+    fallback: Callable[[], Any]
+    # Logged when Ollama is unavailable; None to fall back silently
+    unavailable: Optional[str]
+    # Prefix of the message logged when the call fails
+    error: str
+    # Semantic cache namespace and the text embedded to key it, for results reusable across near-duplicate inputs
+    namespace: Optional[str] = None
+    similar_text: Optional[str] = None
 
 class OllamaService:
+    # Probe result shared by every instance, so constructing the service never blocks on Ollama
+    _last_probe_at: Optional[float] = None
+    _last_probe_ok = False
+    
     def __init__(self):
         self.base_url = "http://localhost:11434"
         self.model = "llama2"
-        self.client_available = self._check_ollama_connection()
-        
-        if self.client_available:
+        # Keep the model loaded between calls instead of letting Ollama unload it after 5 minutes
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self._embeddings = OllamaEmbeddings()
+        # Invariant part of every chat request body
+        self._base_payload = {
+            "model": self.model,
+            "stream": True,
+            "keep_alive": self.keep_alive
+        }
+        # Pooled keep-alive clients, sync and async (for the a* methods), retrying failed connects.
+        # Plain HTTP/1.1: Ollama serves cleartext on localhost, where httpx never negotiates HTTP/2
+        limits = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+        timeout = httpx.Timeout(GENERATE_DEADLINE, connect=10)
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            timeout=timeout,
+            transport=httpx.HTTPTransport(limits=limits, retries=2)
+        )
+        self._aclient = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            transport=httpx.AsyncHTTPTransport(limits=limits, retries=2)
+        )
+        # Ollama runs up to OLLAMA_NUM_PARALLEL requests per model and queues the rest,
+        # so cap in-flight calls to match instead of piling requests onto its queue;
+        # the sync methods may be called from many threads, so they get their own cap
+        num_parallel = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+        self._semaphore = asyncio.Semaphore(num_parallel)
+        self._thread_semaphore = threading.BoundedSemaphore(num_parallel)
+        self._cache = ResponseCache(ttl=CACHE_TTL) if CACHE_ENABLED else None
+    
+    def close(self) -> None:
+        """Close the sync HTTP client and the response cache"""
+        self._client.close()
+        if self._cache is not None:
+            self._cache.close()
+    
+    async def aclose(self) -> None:
+        """Close both HTTP clients and the response cache"""
+        await self._aclient.aclose()
+        self.close()
+    
+    @property
+    def client_available(self) -> bool:
+        """Whether Ollama is reachable, probing lazily on first use"""
+        return self._check_ollama_connection()
+    
+    def _probe_is_fresh(self) -> bool:
+        """Whether the shared probe result is recent enough to reuse"""
+        last_probe_at = OllamaService._last_probe_at
+        return last_probe_at is not None and time.monotonic() - last_probe_at < PROBE_TTL
+    
+    def _record_probe(self, available: bool, reason: str = None) -> bool:
+        """Store a probe result, logging when Ollama comes up and at most once per PROBE_TTL while it is down"""
+        if available and not OllamaService._last_probe_ok:
             logger.info("Ollama client initialized successfully")
-        else:
-            logger.warning("Ollama not available. AI features will be disabled.")
+            self._warm_up()
+        elif not available and not self._probe_is_fresh():
+            # A concurrent probe may already have recorded (and logged) this window's failure
+            detail = f" ({reason})" if reason else ""
+            logger.warning(f"Ollama not available{detail}. AI features will be disabled.")
+        OllamaService._last_probe_at = time.monotonic()
+        OllamaService._last_probe_ok = available
+        return available
+    
+    def _warm_up(self) -> None:
+        """Load the model in the background so the first real request skips the load"""
+        def load() -> None:
+            try:
+                # An empty prompt only loads the model
+                self._client.post(
+                    "/api/generate",
+                    json={"model": self.model, "keep_alive": self.keep_alive}
+                )
+            except Exception as e:
+                logger.warning(f"Ollama warmup failed: {e}")
+        
+        threading.Thread(target=load, daemon=True).start()
     
     def _check_ollama_connection(self) -> bool:
         """Check if Ollama is running and accessible"""
+        if self._probe_is_fresh():
+            return OllamaService._last_probe_ok
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
+            # Outside the retrying clients, so an unreachable Ollama fails fast
+            response = httpx.get(f"{self.base_url}/api/tags", timeout=PROBE_TIMEOUT)
+            return self._record_probe(response.status_code == 200, f"status {response.status_code}")
         except Exception as e:
-            logger.error(f"Ollama connection failed: {e}")
-            return False
+            return self._record_probe(False, str(e))
     
-    def _call_ollama(self, prompt: str, system_prompt: str = None) -> str:
-        """Make a call to Ollama API"""
+    async def _acheck_ollama_connection(self) -> bool:
+        """Async variant of _check_ollama_connection"""
+        if self._probe_is_fresh():
+            return OllamaService._last_probe_ok
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False
-            }
-            
-            if system_prompt:
-                payload["system"] = system_prompt
-            
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()["response"]
-            else:
-                logger.error(f"Ollama API error: {response.status_code}")
-                return ""
-                
+            async with httpx.AsyncClient(base_url=self.base_url, timeout=PROBE_TIMEOUT) as client:
+                response = await client.get("/api/tags")
+            return self._record_probe(response.status_code == 200, f"status {response.status_code}")
         except Exception as e:
-            logger.error(f"Error calling Ollama: {e}")
-            return ""
+            return self._record_probe(False, str(e))
     
-    def extract_keywords_from_job_description(self, job_description: str) -> List[Dict[str, Any]]:
-        """Extract important keywords and skills from job description using Ollama"""
-        if not self.client_available:
-            logger.warning("Ollama client not available. Using fallback keyword extraction.")
-            return self._fallback_keyword_extraction(job_description)
-        
-        system_prompt = """You are an expert at analyzing job descriptions and extracting key skills and requirements. 
-        Return your response as a JSON array with objects containing: keyword, importance (0-1), and category (technical, soft_skill, tool, qualification, or experience).
-        Only return valid JSON, no other text."""
-        
-        prompt = f"""
-        Analyze this job description and extract the most important keywords, skills, and requirements:
-        
-        {job_description}
+    def _context_messages(self, resume_text: str = None, job_description: str = None) -> List[Dict[str, str]]:
+        """
+        Build the chat prefix holding the resume and job description.
         
-        Return as JSON array with objects: [{{"keyword": "skill", "importance": 0.8, "category": "technical"}}]
+        Tasks over the same inputs send this prefix unchanged and differ only in
+        the final user message, so Ollama can reuse the prefix's KV cache
+        instead of prefilling the documents again for every task.
         """
+        context = []
+        if resume_text is not None:
+            context.append(f"Resume:\n{resume_text}")
+        if job_description is not None:
+            context.append(f"Job Description:\n{job_description}")
+        return [
+            {"role": "system", "content": _CONTEXT_SYSTEM_PROMPT},
+            {"role": "user", "content": "\n\n".join(context)}
+        ]
+    
+    def _chat_payload(self, messages: List[Dict[str, str]], options: Dict[str, Any] = None) -> bytes:
+        """Serialize the request body for /api/chat"""
+        payload = {**self._base_payload, "messages": messages}
+        if options:
+            payload["options"] = options
+        return orjson.dumps(payload)
+    
+    def _cache_key(self, messages: List[Dict[str, str]], options: Dict[str, Any] = None) -> str:
+        """Cache key for a chat; namespaced apart from AIService entries in the shared store"""
+        return hashlib.blake2b(
+            b"ollama_service\x00" + self.model.encode() + b"\x00" + orjson.dumps([messages, options])
+        ).hexdigest()
+    
+    def _cached(self, key: str) -> Optional[str]:
+        """Cached response text for a key; None on a miss or with caching disabled"""
+        return self._cache.get(key) if self._cache is not None else None
+    
+    async def _acached(self, key: str) -> Optional[str]:
+        """Async variant of _cached; a disk read runs in a thread"""
+        return await self._cache.aget(key) if self._cache is not None else None
+    
+    def _read_chat_line(self, line: str, parts: List[str]) -> Optional[Dict[str, Any]]:
+        """Append the text of one streamed /api/chat line to parts; returns the line if it is the final one"""
+        if not line:
+            return None
+        chunk = orjson.loads(line)
+        if "error" in chunk:
+            # Failures after generation starts arrive as an error line inside the 200 response
+            raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+        parts.append(chunk.get("message", {}).get("content", ""))
+        if not chunk.get("done"):
+            return None
+        if chunk.get("done_reason") == "length":
+            # Cut off at num_predict: not a usable answer, and caching it would replay the failure
+            raise RuntimeError("Ollama response truncated at num_predict")
+        return chunk
+    
+    def _cacheable(self, text: str, final: Optional[Dict[str, Any]]) -> bool:
+        """Whether a streamed response is complete enough to cache"""
+        # Without the done line the stream ended early, and the text may be cut off
+        return bool(text) and final is not None and self._cache is not None
+    
+    def _finish_chat(self, key: str, parts: List[str], final: Optional[Dict[str, Any]]) -> str:
+        """Join a streamed response, caching it if it completed"""
+        text = "".join(parts)
+        if self._cacheable(text, final):
+            self._cache.set(key, text)
+        return text
+    
+    async def _afinish_chat(self, key: str, parts: List[str], final: Optional[Dict[str, Any]]) -> str:
+        """Async variant of _finish_chat; the disk write runs in a thread"""
+        text = "".join(parts)
+        if self._cacheable(text, final):
+            await self._cache.aset(key, text)
+        return text
+    
+    def _shutdown_stream(self, response: httpx.Response) -> None:
+        """Shut down a streaming response's socket, failing a read blocked on it"""
+        stream = response.extensions.get("network_stream")
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
+    def _call_ollama(self, messages: List[Dict[str, str]], options: Dict[str, Any] = None) -> str:
+        """Make a streaming chat call to Ollama API and return the accumulated text"""
+        key = self._cache_key(messages, options)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
+        parts = []
+        final = None
+        with self._thread_semaphore:
+            deadline = time.monotonic() + GENERATE_DEADLINE
+            try:
+                # The client read timeout equals the deadline, so it only bounds the wait for headers
+                with self._client.stream("POST", "/api/chat", content=self._chat_payload(messages, options), headers=_JSON_HEADERS) as response:
+                    if response.status_code != 200:
+                        logger.error(f"Ollama API error: {response.status_code}")
+                        return ""
+                    
+                    # A blocked sync read cannot be cancelled, so a stalled stream is cut off
+                    # at the deadline by shutting its socket down from a timer thread
+                    timer = threading.Timer(max(0.0, deadline - time.monotonic()), self._shutdown_stream, (response,))
+                    timer.daemon = True
+                    timer.start()
+                    try:
+                        # Ollama streams one JSON object per line
+                        for line in response.iter_lines():
+                            final = self._read_chat_line(line, parts) or final
+                    finally:
+                        timer.cancel()
+                    
+            except Exception as e:
+                if time.monotonic() >= deadline:
+                    logger.error(f"Ollama generation exceeded {GENERATE_DEADLINE:.0f}s")
+                else:
+                    logger.error(f"Error calling Ollama: {e}")
+                return ""
         
-        try:
-            response = self._call_ollama(prompt, system_prompt)
+        return self._finish_chat(key, parts, final)
+    
+    async def _astream_chat(self, messages: List[Dict[str, str]], options: Dict[str, Any], parts: List[str]) -> Optional[Dict[str, Any]]:
+        """Stream a chat response into parts, returning its final line; None if it never completed"""
+        final = None
+        async with self._aclient.stream("POST", "/api/chat", content=self._chat_payload(messages, options), headers=_JSON_HEADERS) as response:
+            if response.status_code != 200:
+                logger.error(f"Ollama API error: {response.status_code}")
+                return None
             
-            # Try to extract JSON from response
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                keywords_data = json.loads(json_match.group())
-                return keywords_data
-            else:
-                # Fallback: extract keywords manually
-                return self._fallback_keyword_extraction(job_description)
-                
-        except Exception as e:
-            logger.error(f"Error extracting keywords with Ollama: {e}")
-            return self._fallback_keyword_extraction(job_description)
+            # Ollama streams one JSON object per line
+            async for line in response.aiter_lines():
+                final = self._read_chat_line(line, parts) or final
+        return final
     
-    def tailor_resume(self, resume_text: str, job_description: str, target_role: str = None) -> str:
-        """Tailor the resume to better match the job description using Ollama"""
-        if not self.client_available:
-            logger.warning("Ollama client not available. Returning original resume.")
-            return resume_text
-        
-        system_prompt = """You are an expert resume writer. Rewrite the resume to better match the job description while maintaining truthfulness and professional tone."""
-        
-        prompt = f"""
-        Job Description:
-        {job_description}
-        
-        Original Resume:
-        {resume_text}
-        
-        Rewrite this resume to better match the job description. Focus on:
-        1. Highlighting relevant skills and experiences
-        2. Using keywords from the job description
-        3. Emphasizing achievements that align with the role
-        4. Maintaining professional tone and truthfulness
-        
-        Return only the rewritten resume text, no explanations.
-        """
+    async def _acall_ollama(self, messages: List[Dict[str, str]], options: Dict[str, Any] = None) -> str:
+        """Async variant of _call_ollama"""
+        key = self._cache_key(messages, options)
+        cached = await self._acached(key)
+        if cached is not None:
+            return cached
+        
+        parts = []
+        try:
+            async with self._semaphore:
+                final = await asyncio.wait_for(self._astream_chat(messages, options, parts), GENERATE_DEADLINE)
+        except asyncio.TimeoutError:
+            logger.error(f"Ollama generation exceeded {GENERATE_DEADLINE:.0f}s")
+            return ""
+        except Exception as e:
+            logger.error(f"Error calling Ollama: {e}")
+            return ""
         
+        return await self._afinish_chat(key, parts, final)
+    
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """Embed text with the Ollama embedding model; None if embeddings are unavailable"""
+        if self._embeddings.missing:
+            return None
         try:
-            tailored_resume = self._call_ollama(prompt, system_prompt)
-            if tailored_resume and len(tailored_resume) > 100:
-                return tailored_resume
-            else:
-                return resume_text
+            with self._thread_semaphore:
+                response = self._client.post("/api/embeddings", content=self._embeddings.payload(text), headers=_JSON_HEADERS)
+            return self._embeddings.parse(response)
         except Exception as e:
-            logger.error(f"Error tailoring resume with Ollama: {e}")
-            return resume_text
+            logger.warning(f"Error embedding text with Ollama: {e}")
+        return None
     
-    def generate_improvement_suggestions(self, resume_text: str, job_description: str, keyword_matches: Dict[str, Any]) -> List[str]:
-        """Generate improvement suggestions using Ollama"""
+    async def _aembed(self, text: str) -> Optional[List[float]]:
+        """Async variant of _embed"""
+        if self._embeddings.missing:
+            return None
+        try:
+            async with self._semaphore:
+                response = await self._aclient.post("/api/embeddings", content=self._embeddings.payload(text), headers=_JSON_HEADERS)
+            return self._embeddings.parse(response)
+        except Exception as e:
+            logger.warning(f"Error embedding text with Ollama: {e}")
+        return None
+    
+    def _run_task(self, task: _ChatTask) -> Any:
+        """Run one chat task and parse its response, falling back if Ollama is unavailable or the call fails"""
         if not self.client_available:
-            logger.warning("Ollama client not available. Using fallback suggestions.")
-            return self._fallback_suggestions(resume_text, job_description, keyword_matches)
-        
-        system_prompt = """You are a career coach and resume expert. Provide specific, actionable suggestions for improving resumes."""
-        
-        prompt = f"""
-        Resume:
-        {resume_text}
-        
-        Job Description:
-        {job_description}
-        
-        Keyword Analysis:
-        {json.dumps(keyword_matches, indent=2)}
-        
-        Provide 5-7 specific, actionable suggestions to improve this resume for this job. 
-        Focus on:
-        1. Adding missing keywords
-        2. Improving bullet points
-        3. Quantifying achievements
-        4. ATS optimization
-        5. Professional presentation
-        
-        Return as a numbered list of suggestions.
-        """
+            if task.unavailable:
+                logger.warning(task.unavailable)
+            return task.fallback()
         
         try:
-            suggestions_text = self._call_ollama(prompt, system_prompt)
-            
-            # Parse suggestions into a list
-            suggestions = []
-            lines = suggestions_text.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
-                    # Remove numbering/bullets and clean up
-                    clean_line = re.sub(r'^[\d\-•\.\s]+', '', line).strip()
-                    if clean_line and len(clean_line) > 10:
-                        suggestions.append(clean_line)
+            # An exact repeat is answered by the response cache inside _call_ollama,
+            # so only a miss pays for the embedding round trip
+            embedding = None
+            if task.namespace is not None and self._cache is not None and self._cached(self._cache_key(task.messages, task.options)) is None:
+                namespace = f"{task.namespace}\x00{self._embeddings.model}"
+                embedding = self._embed(task.similar_text)
+                cached = self._cache.get_similar(namespace, embedding) if embedding else None
+                if cached is not None:
+                    return orjson.loads(cached)
             
-            if suggestions:
-                return suggestions[:7]  # Limit to 7 suggestions
-            else:
-                return self._fallback_suggestions(resume_text, job_description, keyword_matches)
-                
+            result = task.parse(self._call_ollama(task.messages, task.options))
+            if result is None:
+                return task.fallback()
+            if embedding:
+                self._cache.set_similar(namespace, embedding, orjson.dumps(result).decode())
+            return result
         except Exception as e:
-            logger.error(f"Error generating suggestions with Ollama: {e}")
-            return self._fallback_suggestions(resume_text, job_description, keyword_matches)
+            logger.error(f"{task.error}: {e}")
+            return task.fallback()
     
-    def analyze_resume_sections(self, resume_text: str) -> Dict[str, Any]:
-        """Analyze different sections of the resume using Ollama"""
-        if not self.client_available:
-            logger.warning("Ollama client not available. Using fallback section analysis.")
-            return self._fallback_section_analysis(resume_text)
+    async def _arun_task(self, task: _ChatTask) -> Any:
+        """Async variant of _run_task; cache disk I/O and the similarity scan run in a thread"""
+        if not await self._acheck_ollama_connection():
+            if task.unavailable:
+                logger.warning(task.unavailable)
+            return task.fallback()
         
-        system_prompt = """You are an expert resume analyzer. Analyze resume sections and provide insights in JSON format."""
+        try:
+            embedding = None
+            if task.namespace is not None and self._cache is not None and await self._acached(self._cache_key(task.messages, task.options)) is None:
+                namespace = f"{task.namespace}\x00{self._embeddings.model}"
+                embedding = await self._aembed(task.similar_text)
+                cached = await self._cache.aget_similar(namespace, embedding) if embedding else None
+                if cached is not None:
+                    return orjson.loads(cached)
+            
+            result = task.parse(await self._acall_ollama(task.messages, task.options))
+            if result is None:
+                return task.fallback()
+            if embedding:
+                await self._cache.aset_similar(namespace, embedding, orjson.dumps(result).decode())
+            return result
+        except Exception as e:
+            logger.error(f"{task.error}: {e}")
+            return task.fallback()
+    
+    def _keywords_task(self, job_description: str, resume_text: str = None) -> _ChatTask:
+        """Chat task for keyword extraction"""
+        messages = self._context_messages(resume_text, job_description) + [{"role": "user", "content": _KEYWORDS_TASK}]
+        return _ChatTask(
+            messages=messages,
+            options=KEYWORD_OPTIONS,
+            parse=self._parse_keywords,
+            fallback=lambda: self._fallback_keyword_extraction(job_description),
+            unavailable="Ollama client not available. Using fallback keyword extraction.",
+            error="Error extracting keywords with Ollama",
+            # Near-duplicate job descriptions reuse an earlier extraction
+            namespace="ollama_service_keywords",
+            similar_text=job_description
+        )
+    
+    def _parse_keywords(self, response: str) -> Optional[List[Dict[str, Any]]]:
+        """Parse the keyword JSON out of an Ollama response; None if there is none"""
+        # Try to extract JSON from response
+        return _loads_first_json(response, '[')
+    
+    def extract_keywords_from_job_description(self, job_description: str, resume_text: str = None) -> List[Dict[str, Any]]:
+        """
+        Extract important keywords and skills from job description using Ollama.
         
-        prompt = f"""
-        Analyze this resume and provide insights about each section:
+        Pass resume_text when other tasks run on the same resume, so this call
+        sends the same resume and job description prefix as they do.
+        """
+        return self._run_task(self._keywords_task(job_description, resume_text))
+    
+    async def aextract_keywords_from_job_description(self, job_description: str, resume_text: str = None) -> List[Dict[str, Any]]:
+        """Async variant of extract_keywords_from_job_description"""
+        return await self._arun_task(self._keywords_task(job_description, resume_text))
+    
+    def _tailor_task(self, resume_text: str, job_description: str) -> _ChatTask:
+        """Chat task for tailoring a resume"""
+        messages = self._context_messages(resume_text, job_description) + [{"role": "user", "content": _TAILOR_TASK}]
+        return _ChatTask(
+            messages=messages,
+            options=TAILOR_OPTIONS,
+            # A short response is a refusal or a fragment, not a resume
+            parse=lambda text: text if text and len(text) > 100 else None,
+            fallback=lambda: resume_text,
+            unavailable="Ollama client not available. Returning original resume.",
+            error="Error tailoring resume with Ollama"
+        )
+    
+    def tailor_resume(self, resume_text: str, job_description: str, target_role: str = None) -> str:
+        """Tailor the resume to better match the job description using Ollama"""
+        return self._run_task(self._tailor_task(resume_text, job_description))
+    
+    async def atailor_resume(self, resume_text: str, job_description: str, target_role: str = None) -> str:
+        """Async variant of tailor_resume"""
+        return await self._arun_task(self._tailor_task(resume_text, job_description))
+    
+    def _suggestions_task(self, resume_text: str, job_description: str, keyword_matches: Dict[str, Any]) -> _ChatTask:
+        """Chat task for improvement suggestions"""
+        task = _SUGGESTIONS_TASK.format(keyword_analysis=orjson.dumps(keyword_matches, option=orjson.OPT_INDENT_2).decode())
+        messages = self._context_messages(resume_text, job_description) + [{"role": "user", "content": task}]
+        return _ChatTask(
+            messages=messages,
+            options=SUGGESTIONS_OPTIONS,
+            parse=self._parse_suggestions,
+            fallback=lambda: self._fallback_suggestions(resume_text, job_description, keyword_matches),
+            unavailable="Ollama client not available. Using fallback suggestions.",
+            error="Error generating suggestions with Ollama"
+        )
+    
+    def _parse_suggestions(self, suggestions_text: str) -> Optional[List[str]]:
+        """Parse a numbered or bulleted suggestion list out of an Ollama response; None if there is none"""
+        # Parse suggestions into a list
+        suggestions = []
+        lines = suggestions_text.split('\n')
+        for line in lines:
+            line = line.strip()
+            if line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
+                # Remove numbering/bullets and clean up
+                clean_line = _BULLET_RE.sub('', line).strip()
+                if clean_line and len(clean_line) > 10:
+                    suggestions.append(clean_line)
+        
+        return suggestions[:7] or None  # Limit to 7 suggestions
+    
+    def generate_improvement_suggestions(self, resume_text: str, job_description: str, keyword_matches: Dict[str, Any]) -> List[str]:
+        """Generate improvement suggestions using Ollama"""
+        return self._run_task(self._suggestions_task(resume_text, job_description, keyword_matches))
+    
+    async def agenerate_improvement_suggestions(self, resume_text: str, job_description: str, keyword_matches: Dict[str, Any]) -> List[str]:
+        """Async variant of generate_improvement_suggestions"""
+        return await self._arun_task(self._suggestions_task(resume_text, job_description, keyword_matches))
+    
+    def _sections_task(self, resume_text: str, job_description: str = None) -> _ChatTask:
+        """Chat task for section analysis"""
+        messages = self._context_messages(resume_text, job_description) + [{"role": "user", "content": _SECTIONS_TASK}]
+        return _ChatTask(
+            messages=messages,
+            options=SECTIONS_OPTIONS,
+            # Try to extract JSON
+            parse=lambda text: _loads_first_json(text, '{'),
+            fallback=lambda: self._fallback_section_analysis(resume_text),
+            unavailable="Ollama client not available. Using fallback section analysis.",
+            error="Error analyzing sections with Ollama"
+        )
+    
+    def analyze_resume_sections(self, resume_text: str, job_description: str = None) -> Dict[str, Any]:
+        """
+        Analyze different sections of the resume using Ollama.
         
-        {resume_text}
+        Pass job_description when other tasks run on the same job, so this call
+        sends the same resume and job description prefix as they do.
+        """
+        return self._run_task(self._sections_task(resume_text, job_description))
+    
+    async def aanalyze_resume_sections(self, resume_text: str, job_description: str = None) -> Dict[str, Any]:
+        """Async variant of analyze_resume_sections"""
+        return await self._arun_task(self._sections_task(resume_text, job_description))
+    
+    def _analyze_all_task(self, resume_text: str, job_description: str, target_role: str = None) -> _ChatTask:
+        """Chat task for the single multi-task request; falls back to None"""
+        task = _COMBINED_TASK.format(target_role=target_role or "Not specified")
+        messages = self._context_messages(resume_text, job_description) + [{"role": "user", "content": task}]
+        return _ChatTask(
+            messages=messages,
+            options=COMBINED_OPTIONS,
+            parse=lambda text: self._parse_combined(text, resume_text),
+            fallback=lambda: None,
+            # The individual analyses report Ollama being unavailable
+            unavailable=None,
+            error="Error in combined analysis with Ollama"
+        )
+    
+    def _combined_is_complete(self, result: Any) -> bool:
+        """Whether an analyze_all response has every expected field in the expected shape"""
+        if not isinstance(result, dict):
+            return False
+        if not isinstance(result.get("keywords"), list) or not all(isinstance(kw, dict) and "keyword" in kw for kw in result["keywords"]):
+            return False
+        if not isinstance(result.get("suggestions"), list) or not all(isinstance(s, str) for s in result["suggestions"]):
+            return False
+        return isinstance(result.get("tailored_resume"), str) and isinstance(result.get("sections"), dict)
+    
+    def _parse_combined(self, response: str, resume_text: str) -> Optional[Dict[str, Any]]:
+        """Parse an analyze_all response; None if any expected field is missing or malformed"""
+        result = _loads_first_json(response, '{')
+        if not self._combined_is_complete(result):
+            logger.warning("Combined analysis response was incomplete. Running individual analyses.")
+            return None
+        
+        tailored_resume = result["tailored_resume"].strip()
+        return {
+            "keywords": result["keywords"],
+            "tailored_resume": tailored_resume if len(tailored_resume) > 100 else resume_text,
+            "suggestions": [s.strip() for s in result["suggestions"] if s.strip()][:7],
+            "sections": result["sections"]
+        }
+    
+    def _keyword_matches(self, resume_text: str, keywords: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Mark which extracted keywords already appear in the resume"""
+        resume_lower = resume_text.lower()
+        return {kw["keyword"]: {"found": kw["keyword"].lower() in resume_lower} for kw in keywords}
+    
+    def analyze_all(self, resume_text: str, job_description: str, target_role: str = None) -> Dict[str, Any]:
+        """
+        Extract keywords, tailor the resume, generate suggestions and analyze
+        sections with a single Ollama call.
         
-        Return as JSON with sections: experience, education, skills, summary, strengths, weaknesses, suggestions.
+        Returns a dict with "keywords", "tailored_resume", "suggestions" and
+        "sections". If the combined response cannot be used, the individual
+        methods are run instead.
         """
+        result = self._run_task(self._analyze_all_task(resume_text, job_description, target_role))
+        if result is not None:
+            return result
         
-        try:
-            response = self._call_ollama(prompt, system_prompt)
-            
-            # Try to extract JSON
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                analysis = json.loads(json_match.group())
-                return analysis
-            else:
-                return self._fallback_section_analysis(resume_text)
-                
-        except Exception as e:
-            logger.error(f"Error analyzing sections with Ollama: {e}")
-            return self._fallback_section_analysis(resume_text)
+        # Every task sends the same resume and job description prefix, so Ollama prefills it once
+        keywords = self.extract_keywords_from_job_description(job_description, resume_text)
+        return {
+            "keywords": keywords,
+            "tailored_resume": self.tailor_resume(resume_text, job_description, target_role),
+            "suggestions": self.generate_improvement_suggestions(
+                resume_text, job_description, self._keyword_matches(resume_text, keywords)
+            ),
+            "sections": self.analyze_resume_sections(resume_text, job_description)
+        }
+    
+    async def aanalyze_all(self, resume_text: str, job_description: str, target_role: str = None) -> Dict[str, Any]:
+        """Async variant of analyze_all; the fallback runs the individual calls concurrently"""
+        result = await self._arun_task(self._analyze_all_task(resume_text, job_description, target_role))
+        if result is not None:
+            return result
+        
+        # Every task sends the same resume and job description prefix, so Ollama prefills it once
+        keywords, tailored_resume, sections = await asyncio.gather(
+            self.aextract_keywords_from_job_description(job_description, resume_text),
+            self.atailor_resume(resume_text, job_description, target_role),
+            self.aanalyze_resume_sections(resume_text, job_description)
+        )
+        suggestions = await self.agenerate_improvement_suggestions(
+            resume_text, job_description, self._keyword_matches(resume_text, keywords)
+        )
+        return {
+            "keywords": keywords,
+            "tailored_resume": tailored_resume,
+            "suggestions": suggestions,
+            "sections": sections
+        }
     
     def calculate_confidence_score(self, keyword_matches: Dict[str, Any], missing_keywords: List[str], total_keywords: int) -> float:
         """Calculate confidence score based on keyword matches"""
         if total_keywords == 0:
             return 0.0
         
-        matched_count = len([k for k, v in keyword_matches.items() if v.get('found', False)])
-        base_score = matched_count / total_keywords
-        
-        # Bonus for high-frequency matches
+        # Count matches and the bonus for high-frequency matches in a single pass
+        matched_count = 0
         frequency_bonus = 0
-        for keyword, data in keyword_matches.items():
+        for data in keyword_matches.values():
             if data.get('found', False):
+                matched_count += 1
                 frequency = data.get('frequency', 0)
                 if frequency > 1:
                     frequency_bonus += min(0.1, frequency * 0.02)
         
+        base_score = matched_count / total_keywords
         final_score = min(1.0, base_score + frequency_bonus)
         return round(final_score, 3)
     
     # Fallback methods (same as original)
     def _fallback_keyword_extraction(self, job_description: str) -> List[Dict[str, Any]]:
         """Basic keyword extraction without AI"""
-        # Common technical keywords
-        technical_keywords = [
-            'python', 'java', 'javascript', 'sql', 'html', 'css', 'react', 'node.js', 'aws', 'azure',
-            'machine learning', 'ai', 'data science', 'analytics', 'database', 'api', 'git', 'docker',
-            'kubernetes', 'agile', 'scrum', 'project management', 'leadership', 'communication'
+        # Fresh dicts on every call, so callers may modify the result without touching the memo
+        return [
+            {
+                "keyword": _FALLBACK_KEYWORDS[index],
+                "importance": 0.8,
+                "category": "technical"
+            }
+            for index in _fallback_keyword_indices(job_description)
         ]
-        
-        keywords = []
-        job_lower = job_description.lower()
-        
-        for keyword in technical_keywords:
-            if keyword in job_lower:
-                keywords.append({
-                    "keyword": keyword,
-                    "importance": 0.8,
-                    "category": "technical"
-                })
-        
-        return keywords
     
     def _fallback_suggestions(self, resume_text: str, job_description: str, keyword_matches: Dict[str, Any]) -> List[str]:
         """Basic improvement suggestions without AI"""